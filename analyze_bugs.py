@@ -1,28 +1,39 @@
 """
 Analyze saved call transcripts and produce a bug/quality report.
-Reads all JSON files from transcripts/ and uses an LLM to identify issues.
+Reads all JSON files from transcripts/ (preferring a call's .corrected.json) and uses an LLM to identify issues.
 Output: bug_report.md
+
+  python analyze_bugs.py                    # one request per call, free-text notes
+  python analyze_bugs.py --batch            # pack calls into requests up to --budget tokens;
+                                            # structured findings -> findings.json + bug_report.md
+  python analyze_bugs.py --render           # rebuild bug_report.md from an existing findings.json
 """
+import argparse
 import json
 import logging
 import os
+import time
+from collections import Counter
 from pathlib import Path
 
 from openai import OpenAI
 
 from config import TRANSCRIPTS_DIR, OPENAI_API_KEY, OPENAI_API_BASE
+from transcript_store import corrected_path, is_corrected
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 def load_transcripts():
-    """Load all transcript JSON files from transcripts/."""
+    """Load all transcript JSON files from transcripts/ (a call's .corrected.json replaces it)."""
     path = Path(TRANSCRIPTS_DIR)
     if not path.exists():
         return []
     out = []
     for f in path.glob("*.json"):
+        if not is_corrected(str(f)) and os.path.isfile(corrected_path(str(f))):
+            continue
         try:
             with open(f, encoding="utf-8") as fp:
                 out.append((f.name, json.load(fp)))
@@ -31,14 +42,15 @@ def load_transcripts():
     return out
 
 
-def transcript_to_markdown(data: dict) -> str:
-    """Turn conversation list into readable markdown."""
+def transcript_to_markdown(data: dict, numbered: bool = False) -> str:
+    """Turn conversation list into readable markdown (numbered: prefix each turn with [index])."""
     lines = []
-    for turn in data.get("transcript") or data.get("conversation") or []:
+    for i, turn in enumerate(data.get("transcript") or data.get("conversation") or []):
         role = turn.get("role", "")
         text = turn.get("text", "")
         label = "Agent" if role == "agent" else "Patient"
-        lines.append(f"**{label}:** {text}")
+        prefix = f"[{i}] " if numbered else ""
+        lines.append(f"{prefix}**{label}:** {text}")
     return "\n\n".join(lines)
 
 
@@ -73,7 +85,233 @@ def analyze_one(name: str, data: dict, client: OpenAI) -> str:
         return f"(Analysis failed: {e})"
 
 
+# --- batch mode: several calls per request, structured findings ---
+
+FINDINGS_PATH = Path(__file__).parent / "findings.json"
+REPORT_PATH = Path(__file__).parent / "bug_report.md"
+
+CATEGORIES = (
+    "incorrect_info",
+    "hallucination",
+    "misunderstanding",
+    "awkward_phrasing",
+    "missing_behavior",
+    "repetition",
+    "other",
+)
+SEVERITIES = ("low", "medium", "high")
+# Reply allowance per call in a batch, and the most one reply may use. Batches hold at most
+# MAX_BATCH_CALLS calls so every call gets its full allowance.
+OUTPUT_TOKENS_PER_CALL = 400
+MAX_OUTPUT_TOKENS = 4000
+MAX_BATCH_CALLS = MAX_OUTPUT_TOKENS // OUTPUT_TOKENS_PER_CALL
+
+SYSTEM_BATCH = (
+    SYSTEM.split("\n\nBe specific:")[0]
+    + """
+
+You will get several calls, each starting with "### Call: <file>" and with numbered turns ([0], [1], ...).
+Reply with a JSON object only:
+{"calls": [{"file": "<file>", "findings": [{"category": "<category>", "severity": "low|medium|high", "turn_index": <int>, "quote": "<exact words from that turn>", "note": "<why it is an issue>"}]}]}
+Categories: """
+    + ", ".join(CATEGORIES)
+    + """.
+Include every call, with "findings": [] if it has no notable issues. Keep each note to one sentence."""
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English)."""
+    return len(text) // 4 + 1
+
+
+def pack_batches(
+    transcripts: list, budget: int, max_calls: int = MAX_BATCH_CALLS
+) -> list[list[tuple[str, dict, str]]]:
+    """Greedily group (name, data) into batches whose call text fits the token budget, at most
+    max_calls per batch (the reply allowance). A call longer than the budget goes in a batch of its own."""
+    batches, current, used = [], [], 0
+    for name, data in transcripts:
+        block = f"### Call: {name}\nScenario: {data.get('scenario_id', '?')}\n\n{transcript_to_markdown(data, True)}"
+        cost = estimate_tokens(block)
+        if current and (used + cost > budget or len(current) >= max_calls):
+            batches.append(current)
+            current, used = [], 0
+        current.append((name, data, block))
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _clean_finding(raw: dict, turns: int) -> dict:
+    category = str(raw.get("category", "other")).strip().lower()
+    severity = str(raw.get("severity", "medium")).strip().lower()
+    turn_index = raw.get("turn_index")
+    try:
+        turn_index = int(turn_index)
+    except (TypeError, ValueError):
+        turn_index = None
+    if turn_index is not None and not 0 <= turn_index < turns:
+        turn_index = None
+    return {
+        "category": category if category in CATEGORIES else "other",
+        "severity": severity if severity in SEVERITIES else "medium",
+        "turn_index": turn_index,
+        "quote": str(raw.get("quote") or "").strip(),
+        "note": str(raw.get("note") or "").strip(),
+    }
+
+
+class _ReplyUnusable(Exception):
+    """The batch reply was cut off or isn't valid JSON."""
+
+
+def _request_findings(batch: list[tuple[str, dict, str]], client: OpenAI) -> dict:
+    r = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": SYSTEM_BATCH},
+            {"role": "user", "content": "\n\n".join(block for _, _, block in batch)},
+        ],
+        response_format={"type": "json_object"},
+        max_tokens=min(MAX_OUTPUT_TOKENS, OUTPUT_TOKENS_PER_CALL * len(batch)),
+        temperature=0,
+    )
+    choice = r.choices[0]
+    if choice.finish_reason == "length":
+        raise _ReplyUnusable("reply cut off at max_tokens")
+    try:
+        result = json.loads(choice.message.content or "{}")
+    except ValueError as e:
+        raise _ReplyUnusable(f"reply is not valid JSON: {e}") from None
+    if not isinstance(result, dict):
+        raise _ReplyUnusable("reply is not a JSON object")
+    return result
+
+
+def analyze_batch(batch: list[tuple[str, dict, str]], client: OpenAI) -> list[dict]:
+    """One request for the whole batch; returns one findings record per call. A reply that is
+    cut off or unparseable is retried as two half batches, down to single calls."""
+    records = {
+        name: {
+            "file": name,
+            "scenario_id": data.get("scenario_id", "?"),
+            "turns": len(data.get("transcript") or data.get("conversation") or []),
+            "findings": [],
+        }
+        for name, data, _ in batch
+    }
+    try:
+        result = _request_findings(batch, client)
+    except _ReplyUnusable as e:
+        if len(batch) > 1:
+            half = len(batch) // 2
+            logger.warning("Batch of %d: %s; retrying as %d + %d", len(batch), e, half, len(batch) - half)
+            return analyze_batch(batch[:half], client) + analyze_batch(batch[half:], client)
+        for record in records.values():
+            record["error"] = f"Analysis failed: {e}"
+        return list(records.values())
+    except Exception as e:
+        for record in records.values():
+            record["error"] = f"Analysis failed: {e}"
+        return list(records.values())
+
+    seen = set()
+    for call in result.get("calls") or []:
+        record = records.get(call.get("file"))
+        if record is None:
+            continue
+        seen.add(record["file"])
+        record["findings"] = [_clean_finding(f, record["turns"]) for f in call.get("findings") or [] if isinstance(f, dict)]
+    for name, record in records.items():
+        if name not in seen:
+            record["error"] = "Missing from the model's reply"
+    return list(records.values())
+
+
+def aggregate(calls: list[dict]) -> dict:
+    """Finding counts per category, per severity and per scenario x category."""
+    by_category, by_severity = Counter(), Counter()
+    by_scenario: dict[str, Counter] = {}
+    for call in calls:
+        scenario = by_scenario.setdefault(call["scenario_id"], Counter())
+        for f in call["findings"]:
+            by_category[f["category"]] += 1
+            by_severity[f["severity"]] += 1
+            scenario[f["category"]] += 1
+    return {
+        "by_category": dict(by_category.most_common()),
+        "by_severity": {s: by_severity[s] for s in SEVERITIES if by_severity[s]},
+        "by_scenario": {k: dict(v.most_common()) for k, v in sorted(by_scenario.items())},
+    }
+
+
+def render_report(doc: dict) -> str:
+    """bug_report.md from a findings document."""
+    counts = doc["counts"]
+    calls = doc["calls"]
+    lines = [
+        "# Bug & Quality Report",
+        "",
+        f"Generated from {len(calls)} call transcript(s) in {doc.get('requests', '?')} request(s). "
+        f"Structured findings: `{FINDINGS_PATH.name}`.",
+        "",
+        "## Summary",
+        "",
+        "| Category | Findings |",
+        "|----------|----------|",
+    ]
+    lines += [f"| {c} | {n} |" for c, n in counts["by_category"].items()] or ["| (none) | 0 |"]
+    lines += ["", "| Severity | Findings |", "|----------|----------|"]
+    lines += [f"| {s} | {n} |" for s, n in counts["by_severity"].items()] or ["| (none) | 0 |"]
+    lines += ["", "| Scenario | Findings by category |", "|----------|----------------------|"]
+    for scenario, cats in counts["by_scenario"].items():
+        lines.append(f"| {scenario} | {', '.join(f'{c}: {n}' for c, n in cats.items()) or 'none'} |")
+    lines.append("")
+    for call in calls:
+        lines += [f"## {call['file']}", "", f"Scenario: {call['scenario_id']}", ""]
+        if call.get("error"):
+            lines.append(f"({call['error']})")
+        elif not call["findings"]:
+            lines.append("No significant issues found.")
+        for f in call["findings"]:
+            where = f"turn {f['turn_index']}" if f["turn_index"] is not None else "turn ?"
+            quote = f' — "{f["quote"]}"' if f["quote"] else ""
+            lines.append(f"- **{f['severity']}** `{f['category']}` ({where}){quote}: {f['note']}")
+        lines += ["", "---", ""]
+    return "\n".join(lines)
+
+
+def run_batch(transcripts: list, client: OpenAI, budget: int) -> dict:
+    batches = pack_batches(transcripts, budget)
+    logger.info("Analyzing %d call(s) in %d request(s)", len(transcripts), len(batches))
+    calls = []
+    for batch in batches:
+        calls.extend(analyze_batch(batch, client))
+    calls.sort(key=lambda c: c["file"])
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "requests": len(batches),
+        "calls": calls,
+        "counts": aggregate(calls),
+    }
+
+
 def main():
+    ap = argparse.ArgumentParser(description="LLM bug/quality report from call transcripts")
+    ap.add_argument("--batch", action="store_true", help="Pack calls into few requests; structured findings")
+    ap.add_argument("--budget", type=int, default=6000, help="Transcript tokens per batch request (approx.)")
+    ap.add_argument("--render", action="store_true", help=f"Only rebuild {REPORT_PATH.name} from {FINDINGS_PATH.name}")
+    args = ap.parse_args()
+
+    if args.render:
+        with open(FINDINGS_PATH, encoding="utf-8") as f:
+            doc = json.load(f)
+        REPORT_PATH.write_text(render_report(doc), encoding="utf-8")
+        print("Wrote", REPORT_PATH)
+        return
+
     if not OPENAI_API_KEY:
         print("Set OPENAI_API_KEY in .env")
         return
@@ -86,7 +324,15 @@ def main():
         print("No transcripts found in", TRANSCRIPTS_DIR)
         return
 
-    out_path = Path(__file__).parent / "bug_report.md"
+    if args.batch:
+        doc = run_batch(sorted(transcripts, key=lambda t: t[0]), client, args.budget)
+        with open(FINDINGS_PATH, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+        REPORT_PATH.write_text(render_report(doc), encoding="utf-8")
+        print("Wrote", FINDINGS_PATH, "and", REPORT_PATH, f"({doc['requests']} request(s))")
+        return
+
+    out_path = REPORT_PATH
     sections = [
         "# Bug & Quality Report",
         "",
@@ -2,13 +2,13 @@
 Audio conversion for Twilio (8kHz mulaw) and OpenAI (Whisper / TTS).
 Twilio Media Streams: inbound/outbound audio is audio/x-mulaw, 8000 Hz, mono.
 Uses pure Python + numpy (no audioop; audioop was removed in Python 3.13).
+numpy is imported on first use; call warm_tables() at startup to build the codec
+lookup tables before the first call needs them.
 """
 import base64
 import io
-import struct
 import wave
-
-import numpy as np
+from typing import Optional
 
 # Twilio format
 SAMPLE_RATE_TWILIO = 8000
@@ -17,6 +17,10 @@ SAMPLE_RATE_TTS = 24000
 
 # G.711 mu-law decode table (8-bit -> 16-bit linear)
 _ULAW_EXPAND_TABLE = None
+# Same table as little-endian int16 numpy array, indexed by mulaw byte
+_ULAW_EXPAND_NP = None
+# G.711 mu-law encode table: 65536 entries, indexed by (int16 sample + 32768)
+_ULAW_COMPRESS_NP = None
 
 
 def _ulaw_expand_table():
@@ -35,14 +39,20 @@ def _ulaw_expand_table():
     return table
 
 
+def _ulaw_expand_np():
+    global _ULAW_EXPAND_NP
+    if _ULAW_EXPAND_NP is None:
+        import numpy as np
+
+        _ULAW_EXPAND_NP = np.array(_ulaw_expand_table(), dtype="<i2")
+    return _ULAW_EXPAND_NP
+
+
 def mulaw_to_pcm(mulaw_bytes: bytes) -> bytes:
     """Convert 8-bit mulaw to 16-bit linear PCM (for Whisper)."""
-    table = _ulaw_expand_table()
-    pcm = bytearray(len(mulaw_bytes) * 2)
-    for i, u in enumerate(mulaw_bytes):
-        s = table[u]
-        struct.pack_into("<h", pcm, i * 2, s)
-    return bytes(pcm)
+    import numpy as np
+
+    return _ulaw_expand_np()[np.frombuffer(mulaw_bytes, dtype=np.uint8)].tobytes()
 
 
 def _linear_to_ulaw(sample: int) -> int:
@@ -63,17 +73,32 @@ def _linear_to_ulaw(sample: int) -> int:
     return (0xFF ^ (sign | (exponent << 4) | mantissa)) & 0xFF
 
 
+def _ulaw_compress_np():
+    global _ULAW_COMPRESS_NP
+    if _ULAW_COMPRESS_NP is None:
+        import numpy as np
+
+        table = bytes(_linear_to_ulaw(s) for s in range(-32768, 32768))
+        _ULAW_COMPRESS_NP = np.frombuffer(table, dtype=np.uint8)
+    return _ULAW_COMPRESS_NP
+
+
+def warm_tables() -> None:
+    """Build the mu-law encode/decode tables now instead of on the first turn."""
+    _ulaw_expand_np()
+    _ulaw_compress_np()
+
+
 def pcm_16_to_mulaw(pcm_16_bytes: bytes, sample_rate: int = SAMPLE_RATE_TTS) -> bytes:
     """Convert 16-bit PCM at given sample rate to 8kHz mulaw for Twilio."""
+    import numpy as np
+
     arr = np.frombuffer(pcm_16_bytes, dtype=np.int16)
     if sample_rate != SAMPLE_RATE_TWILIO:
         n_out = int(len(arr) * SAMPLE_RATE_TWILIO / sample_rate)
         indices = np.linspace(0, len(arr) - 1, n_out, dtype=np.int64)
         arr = arr[indices]
-    out = bytearray(len(arr))
-    for i in range(len(arr)):
-        out[i] = _linear_to_ulaw(int(arr[i]))
-    return bytes(out)
+    return _ulaw_compress_np()[arr.astype(np.int32) + 32768].tobytes()
 
 
 def mulaw_buffer_to_wav_io(mulaw_bytes: bytes) -> io.BytesIO:
@@ -101,3 +126,28 @@ def mulaw_chunks_to_base64(mulaw_bytes: bytes, chunk_size: int = 320) -> list[st
         chunk = mulaw_bytes[i : i + chunk_size]
         chunks.append(base64.b64encode(chunk).decode("ascii"))
     return chunks
+
+
+# Voice activity: a sample is "loud" at |s| >= _LOUD_LEVEL; a 20 ms frame is voiced when at
+# least _VOICED_SAMPLES of its 160 samples are loud. bytes.translate maps each mulaw byte to
+# 0/1 in C, so this stays cheap without numpy.
+_LOUD_LEVEL = 1024
+_VOICED_SAMPLES = 16
+_LOUD_TABLE = None
+
+
+def voiced_span_ms(mulaw_bytes: bytes, frame_bytes: int = 160) -> Optional[tuple[int, int]]:
+    """(start_ms, end_ms) of speech within an 8 kHz mulaw buffer, or None if it is all quiet."""
+    global _LOUD_TABLE
+    if _LOUD_TABLE is None:
+        _LOUD_TABLE = bytes(1 if abs(s) >= _LOUD_LEVEL else 0 for s in _ulaw_expand_table())
+    first = last = None
+    for i in range(0, len(mulaw_bytes), frame_bytes):
+        if mulaw_bytes[i : i + frame_bytes].translate(_LOUD_TABLE).count(1) >= _VOICED_SAMPLES:
+            if first is None:
+                first = i
+            last = i + frame_bytes
+    if first is None:
+        return None
+    ms_per_byte = 1000 / SAMPLE_RATE_TWILIO
+    return int(first * ms_per_byte), int(min(last, len(mulaw_bytes)) * ms_per_byte)
@@ -0,0 +1 @@
+"""Benchmarks for the voice bot. Run from the repo root: python -m benchmarks.<name>."""
@@ -0,0 +1,165 @@
+"""
+Load generator: how many concurrent calls one server process sustains (gevent vs asyncio mode).
+Each simulated call opens /media, sends Twilio-style start + 20 ms media frames in real time,
+and measures reply latency (end of a ~2 s batch -> first reply media frame back).
+
+Point the server at the local OpenAI stub so no real API is used:
+  python check_concurrency.py --stub 5099
+  OPENAI_API_KEY=stub OPENAI_API_BASE=http://127.0.0.1:5099/v1 VOICE_BOT_WEBSOCKET=1 python server.py
+  (or: ... python server_async.py)
+Then:
+  python -m benchmarks.calls_per_process --url ws://127.0.0.1:5050/media --calls 100,500,1000 --server-pid <pid>
+--idle opens sockets that only send start (thousands of idle calls).
+For prefork (VOICE_BOT_WORKERS=N python server.py), compare calls sustained at N=1,2,4... and pass
+the workers' pids (per_worker in /metrics) as --server-pid 101,102,...
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import time
+
+import aiohttp
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz mulaw, as Twilio sends
+FRAME_SECONDS = 0.02
+BATCH_FRAMES = 100  # server transcribes every 100 frames
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+async def _one_call(session, url: str, i: int, duration: float, idle: bool, stats: dict):
+    t0 = time.monotonic()
+    try:
+        ws = await session.ws_connect(url, heartbeat=None)
+    except Exception:
+        stats["failed"] += 1
+        return
+    stats["connect_s"].append(time.monotonic() - t0)
+    stream_sid = f"MZbench{i}"
+    batch_sent_at = None
+
+    async def receive():
+        nonlocal batch_sent_at
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            if batch_sent_at is not None and '"media"' in msg.data:
+                stats["reply_s"].append(time.monotonic() - batch_sent_at)
+                batch_sent_at = None
+
+    reader = asyncio.create_task(receive())
+    try:
+        await ws.send_str(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+        await ws.send_str(
+            json.dumps(
+                {
+                    "event": "start",
+                    "streamSid": stream_sid,
+                    "start": {"streamSid": stream_sid, "customParameters": {"scenario_id": "bench"}},
+                }
+            )
+        )
+        payload = base64.b64encode(bytes(range(FRAME_BYTES))).decode("ascii")
+        start = time.monotonic()
+        n = 0
+        while time.monotonic() - start < duration:
+            if idle:
+                await asyncio.sleep(1.0)
+                continue
+            n += 1
+            frame = {
+                "event": "media",
+                "streamSid": stream_sid,
+                "media": {"track": "inbound", "chunk": str(n), "timestamp": str(n * 20), "payload": payload},
+            }
+            await ws.send_str(json.dumps(frame))
+            if n % BATCH_FRAMES == 0:
+                batch_sent_at = time.monotonic()
+            # Real-time pacing; lag shows the client (or server backpressure) falling behind.
+            lag = (time.monotonic() - start) - n * FRAME_SECONDS
+            if lag < 0:
+                await asyncio.sleep(-lag)
+        await ws.send_str(json.dumps({"event": "stop", "streamSid": stream_sid, "stop": {"callSid": f"CAbench{i}"}}))
+        stats["completed"] += 1
+    except Exception:
+        stats["failed"] += 1
+    finally:
+        await ws.close()
+        reader.cancel()
+
+
+def _pct(values: list, q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_level(url: str, calls: int, duration: float, idle: bool, ramp: float) -> dict:
+    stats = {"connect_s": [], "reply_s": [], "completed": 0, "failed": 0}
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        tasks = []
+        for i in range(calls):
+            tasks.append(asyncio.create_task(_one_call(session, url, i, duration, idle, stats)))
+            if ramp:
+                await asyncio.sleep(ramp / calls)
+        await asyncio.gather(*tasks)
+    return {
+        "calls": calls,
+        "completed": stats["completed"],
+        "failed": stats["failed"],
+        "connect_p50_ms": 1000 * _pct(stats["connect_s"], 0.5),
+        "reply_p50_ms": 1000 * (statistics.median(stats["reply_s"]) if stats["reply_s"] else float("nan")),
+        "reply_p99_ms": 1000 * _pct(stats["reply_s"], 0.99),
+        "replies": len(stats["reply_s"]),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent-call load generator for /media")
+    ap.add_argument("--url", default="ws://127.0.0.1:5050/media")
+    ap.add_argument("--calls", default="50,200,500", help="Comma-separated concurrency levels")
+    ap.add_argument("--duration", type=float, default=10.0, help="Seconds each call streams")
+    ap.add_argument("--ramp", type=float, default=2.0, help="Seconds to open all calls of a level")
+    ap.add_argument("--idle", action="store_true", help="Open sockets without streaming media")
+    ap.add_argument(
+        "--server-pid", default="", help="Report these processes' RSS after each level (comma-separated: prefork workers)"
+    )
+    ap.add_argument("--max-p99-ms", type=float, default=3000.0, help="Reply p99 a level must stay under")
+    ap.add_argument("--out", default="", help="Write results JSON here")
+    args = ap.parse_args()
+
+    results = []
+    for level in [int(x) for x in args.calls.split(",") if x.strip()]:
+        r = asyncio.run(run_level(args.url, level, args.duration, args.idle, args.ramp))
+        if args.server_pid:
+            r["server_rss_mb"] = sum(_rss_mb(int(pid)) for pid in args.server_pid.split(",") if pid.strip())
+        results.append(r)
+        print(
+            f"  {level:>6} calls: completed={r['completed']} failed={r['failed']} "
+            f"connect_p50={r['connect_p50_ms']:.0f}ms reply_p50={r['reply_p50_ms']:.0f}ms "
+            f"reply_p99={r['reply_p99_ms']:.0f}ms rss={r.get('server_rss_mb', float('nan')):.0f}MB"
+        )
+    sustained = [
+        r["calls"] for r in results if r["failed"] == 0 and (args.idle or r["reply_p99_ms"] <= args.max_p99_ms)
+    ]
+    print(f"Calls per process sustained: {max(sustained) if sustained else 0}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "idle": args.idle, "levels": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
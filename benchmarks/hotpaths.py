@@ -0,0 +1,197 @@
+"""
+Microbenchmarks for the audio and serialization hot paths of a call, with a regression gate.
+Throughput is normalized per second of call audio (or per transcript save); higher is better.
+
+  python -m benchmarks.hotpaths run                   # print, save to benchmarks/results/
+  python -m benchmarks.hotpaths run --save-baseline   # also store benchmarks/baseline.json
+  python -m benchmarks.hotpaths compare               # run now, fail if >10% slower than baseline
+                                                      # or if a baseline benchmark didn't run
+  python -m benchmarks.hotpaths compare --current benchmarks/results/<file>.json --threshold 0.05
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import audio_utils
+from transcript_store import transcript_payload, write_json
+from twilio_media import media_message, parse_message
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "results")
+BASELINE_PATH = os.path.join(HERE, "baseline.json")
+
+SECOND_MULAW = bytes((i * 37) & 0xFF for i in range(8000))  # 1 s of 8 kHz mulaw
+SECOND_PCM_24K = b"".join(((i * 97) % 20000 - 10000).to_bytes(2, "little", signed=True) for i in range(24000))
+# One second of inbound Twilio frames (50 x 20 ms)
+SECOND_INBOUND = [
+    json.dumps(
+        {
+            "event": "media",
+            "sequenceNumber": str(n),
+            "media": {
+                "track": "inbound",
+                "chunk": str(n),
+                "timestamp": str(n * 20),
+                "payload": base64.b64encode(SECOND_MULAW[n * 160 : (n + 1) * 160]).decode("ascii"),
+            },
+            "streamSid": "MZ18ad3ab5a668481ce02b83e7395059f0",
+        },
+        separators=(",", ":"),
+    )
+    for n in range(50)
+]
+SECOND_OUTBOUND = audio_utils.mulaw_chunks_to_base64(SECOND_MULAW)
+CONVERSATION = [
+    {"role": "agent" if i % 2 else "patient", "text": "Can I get your date of birth to pull up your chart, please?"}
+    for i in range(20)
+]
+
+
+def _parse_inbound():
+    buf = bytearray()
+    for message in SECOND_INBOUND:
+        _, _, frame = parse_message(message)
+        buf.extend(base64.b64decode(frame.payload))
+
+
+def _build_outbound():
+    for payload in SECOND_OUTBOUND:
+        media_message("MZ18ad3ab5a668481ce02b83e7395059f0", payload)
+
+
+def _save_transcript(path: str):
+    write_json(path, transcript_payload(CONVERSATION, "schedule_new", "CA0123456789"))
+
+
+def cases(tmp_dir: str) -> dict:
+    """name -> (callable, unit). Each call processes 1 s of audio, or one 20-turn transcript save."""
+    save_path = os.path.join(tmp_dir, "call_bench.json")
+    return {
+        "mulaw_to_pcm": (lambda: audio_utils.mulaw_to_pcm(SECOND_MULAW), "audio_s/s"),
+        "pcm_16_to_mulaw": (lambda: audio_utils.pcm_16_to_mulaw(SECOND_PCM_24K, 24000), "audio_s/s"),
+        "mulaw_buffer_to_wav_io": (lambda: audio_utils.mulaw_buffer_to_wav_io(SECOND_MULAW), "audio_s/s"),
+        "mulaw_chunks_to_base64": (lambda: audio_utils.mulaw_chunks_to_base64(SECOND_MULAW), "audio_s/s"),
+        "inbound_event_parse": (_parse_inbound, "audio_s/s"),
+        "outbound_frame_json": (_build_outbound, "audio_s/s"),
+        "save_transcript": (lambda: _save_transcript(save_path), "saves/s"),
+    }
+
+
+def measure(fn, min_time: float = 0.2, repeats: int = 5) -> float:
+    """Best-of-repeats calls per second, each repeat running at least min_time."""
+    fn()  # warm tables / caches
+    n = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        if time.perf_counter() - t0 >= min_time:
+            break
+        n *= 2
+    best = 0.0
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        best = max(best, n / (time.perf_counter() - t0))
+    return best
+
+
+def run(only: list[str] = None) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, (fn, unit) in cases(tmp).items():
+            if only and name not in only:
+                continue
+            value = measure(fn)
+            results[name] = {"value": value, "unit": unit}
+            print(f"  {name:<24} {value:>14,.1f} {unit}")
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float, allow_missing: bool = False) -> list[str]:
+    """
+    Names whose throughput dropped more than threshold (fraction) below the baseline, and
+    baseline names missing from current (a renamed or deleted benchmark) unless allow_missing.
+    """
+    regressions = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            flag = "missing (allowed)" if allow_missing else "MISSING"
+            print(f"  {name:<24} {base['value']:>14,.1f} -> {'-':>14} {base['unit']:<10} {'':>7}  {flag}")
+            if not allow_missing:
+                regressions.append(name)
+            continue
+        change = cur["value"] / base["value"] - 1
+        flag = "REGRESSION" if change < -threshold else "ok"
+        print(f"  {name:<24} {base['value']:>14,.1f} -> {cur['value']:>14,.1f} {cur['unit']:<10} {change:+7.1%}  {flag}")
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def _write(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Hot path microbenchmarks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_run = sub.add_parser("run", help="Run the benchmarks and save results")
+    p_run.add_argument("--only", default="", help="Comma-separated benchmark names")
+    p_run.add_argument("--out", default="", help="Results file (default: benchmarks/results/hotpaths-<time>.json)")
+    p_run.add_argument("--save-baseline", action="store_true", help=f"Also write {BASELINE_PATH}")
+    p_cmp = sub.add_parser("compare", help="Fail if any hot path regressed against the baseline")
+    p_cmp.add_argument("--baseline", default=BASELINE_PATH)
+    p_cmp.add_argument("--current", default="", help="Results file to check (default: run now)")
+    p_cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown, e.g. 0.10 = 10%%")
+    p_cmp.add_argument(
+        "--allow-missing", action="store_true", help="Don't fail on baseline benchmarks missing from the results"
+    )
+    args = ap.parse_args()
+
+    if args.cmd == "run":
+        data = run([x for x in args.only.split(",") if x])
+        out = args.out or os.path.join(RESULTS_DIR, f"hotpaths-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        _write(out, data)
+        print("Wrote", out)
+        if args.save_baseline:
+            _write(BASELINE_PATH, data)
+            print("Wrote", BASELINE_PATH)
+        return
+
+    if not os.path.isfile(args.baseline):
+        print("No baseline at", args.baseline, "- create one with: python -m benchmarks.hotpaths run --save-baseline")
+        sys.exit(2)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+    else:
+        current = run(list(baseline["results"]))
+    print(f"Against baseline from {baseline['meta'].get('time', '?')} (threshold {args.threshold:.0%}):")
+    regressions = compare(baseline, current, args.threshold, args.allow_missing)
+    if regressions:
+        print("Regressed or missing:", ", ".join(regressions))
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Startup cost: import time of each entry module (fresh interpreter, median of --runs),
+readiness.warm_up() time, and first-turn latency (patient reply + TTS) in a cold process
+vs one that ran warm_up() first. First-turn timing needs OPENAI_API_KEY (or a stub base URL).
+Run: python -m benchmarks.startup [--runs 5] [--no-turn]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ["config", "audio_utils", "stt_tts", "patient_bot", "server", "server_async", "check_health", "make_call"]
+
+_IMPORT_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import {module}
+print(time.perf_counter() - t0)
+"""
+
+_TURN_SNIPPET = """
+import json, time
+import readiness
+warm = {warm}
+t0 = time.perf_counter()
+if warm:
+    readiness.warm_up()
+warm_s = time.perf_counter() - t0
+from patient_bot import patient_response
+from stt_tts import text_to_mulaw
+t1 = time.perf_counter()
+reply = patient_response("schedule_new", [], "Thanks for calling, how can I help you?")
+audio = text_to_mulaw(reply)
+print(json.dumps({{"warm_up_s": warm_s, "first_turn_s": time.perf_counter() - t1, "audio_bytes": len(audio)}}))
+"""
+
+
+def _run(snippet: str) -> str:
+    out = subprocess.run([sys.executable, "-c", snippet], cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "failed")
+    return out.stdout.strip().splitlines()[-1]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Import time and first-turn latency")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--no-turn", action="store_true", help="Skip the first-turn API measurement")
+    ap.add_argument("--out", default="", help="Write results JSON here")
+    args = ap.parse_args()
+
+    results = {"import_ms": {}, "first_turn": {}}
+    print("Import time (fresh interpreter, median):")
+    for module in MODULES:
+        try:
+            times = [float(_run(_IMPORT_SNIPPET.format(module=module))) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"  {module:<14} skipped ({e})")
+            continue
+        ms = 1000 * statistics.median(times)
+        results["import_ms"][module] = round(ms, 1)
+        print(f"  {module:<14} {ms:8.1f} ms")
+
+    if not args.no_turn:
+        print("First turn (patient reply + TTS):")
+        for label, warm in (("cold", False), ("warmed", True)):
+            try:
+                r = json.loads(_run(_TURN_SNIPPET.format(warm=warm)))
+            except (RuntimeError, ValueError) as e:
+                print(f"  {label:<8} skipped ({e})")
+                continue
+            results["first_turn"][label] = r
+            print(f"  {label:<8} first turn {1000 * r['first_turn_s']:8.1f} ms  (warm-up {1000 * r['warm_up_s']:.1f} ms)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
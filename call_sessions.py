@@ -0,0 +1,275 @@
+"""
+Per-call session state and the process-wide registry used for admission control.
+/twiml admits a call (PENDING) only while the process is under VOICE_BOT_MAX_CALLS; the
+/media stream then opens its own session and claims the reservation via the session_id
+Stream parameter. That id only arrives with the stream's start event, so until then the new
+stream holds the slot of the oldest reservation (a call is never counted twice). /calls shows every session's live state.
+
+State machine:
+    PENDING -> CONNECTED -> STREAMING <-> REPLYING
+    any state -> CLOSED
+"""
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+from config import MAX_CONCURRENT_CALLS
+
+# A reservation from /twiml that never gets a stream (call not answered, etc.) expires.
+PENDING_TTL_SECONDS = 60.0
+
+# Endpointing (shared by both servers and replay_calls.py):
+# Minimum buffer size before running STT (~1.5 sec at 8kHz mulaw = 12000 bytes)
+MIN_BUFFER_BYTES = 12000
+# Process every N inbound media messages (each 160 bytes = 20ms) -> ~2 sec
+MEDIA_BATCH_SIZE = 100
+# Smallest remainder worth transcribing when the call ends (~100 ms)
+MIN_FLUSH_BYTES = 800
+FRAME_MS = 20  # one 160-byte inbound frame
+
+
+class Utterance(NamedTuple):
+    """An endpointed piece of the agent's audio and where it sits on the stream's media clock."""
+
+    audio: bytes
+    start_ms: Optional[int]  # Twilio media timestamp of the first buffered frame
+    end_ms: Optional[int]  # end of the last buffered frame
+
+
+class CallState:
+    PENDING = "pending"  # admitted by /twiml, stream not open yet
+    CONNECTED = "connected"  # WebSocket open, waiting for the start event
+    STREAMING = "streaming"  # receiving inbound audio
+    REPLYING = "replying"  # STT -> LLM -> TTS for one turn
+    CLOSED = "closed"
+
+
+_TRANSITIONS = {
+    CallState.PENDING: {CallState.CONNECTED, CallState.CLOSED},
+    CallState.CONNECTED: {CallState.STREAMING, CallState.CLOSED},
+    CallState.STREAMING: {CallState.REPLYING, CallState.CLOSED},
+    CallState.REPLYING: {CallState.STREAMING, CallState.CLOSED},
+    CallState.CLOSED: set(),
+}
+
+
+class CallSession:
+    """Everything one call needs; replaces the closure locals of the media handler."""
+
+    __slots__ = (
+        "session_id",
+        "state",
+        "scenario_id",
+        "stream_sid",
+        "call_sid",
+        "conversation",
+        "fillers",
+        "inbound_buffer",
+        "media_count",
+        "first_utterance_sent",
+        "live_transcript_path",
+        "profiler",
+        "recorder",
+        "reservation",
+        "utterance_start_ms",
+        "last_media_ms",
+        "last_media_at",
+        "created_at",
+        "state_since",
+    )
+
+    def __init__(self, state: str = CallState.CONNECTED, scenario_id: str = "schedule_new"):
+        now = time.time()
+        self.session_id = uuid.uuid4().hex
+        self.state = state
+        self.scenario_id = scenario_id
+        self.stream_sid: Optional[str] = None
+        self.call_sid: Optional[str] = None
+        self.conversation: list[dict] = []
+        self.fillers: list[dict] = []  # filler clips played, kept apart from the turns
+        self.inbound_buffer = bytearray()
+        self.media_count = 0
+        self.first_utterance_sent = False
+        self.live_transcript_path: Optional[str] = None
+        self.profiler = None  # profiling.CallProfiler when this call is profiled
+        self.recorder = None  # recordings.InboundRecorder when the inbound track is recorded
+        self.reservation: Optional["CallSession"] = None  # PENDING session whose slot this stream holds
+        self.utterance_start_ms: Optional[int] = None  # media clock at the start of inbound_buffer
+        self.last_media_ms: Optional[int] = None  # media clock of the latest inbound frame
+        self.last_media_at = 0.0  # time.monotonic() when it arrived
+        self.created_at = now
+        self.state_since = now
+
+    def transition(self, new_state: str) -> None:
+        """Move to new_state; raises ValueError for a transition the state machine doesn't allow."""
+        if new_state == self.state:
+            return
+        if new_state not in _TRANSITIONS[self.state]:
+            raise ValueError(f"Call {self.session_id}: illegal transition {self.state} -> {new_state}")
+        self.state = new_state
+        self.state_since = time.time()
+
+    def add_inbound(self, chunk: bytes, timestamp_ms: Optional[int] = None) -> Optional[Utterance]:
+        """
+        Buffer one inbound media frame (timestamp_ms: its Twilio media timestamp). Every
+        MEDIA_BATCH_SIZE frames, if at least MIN_BUFFER_BYTES are buffered, return them (and
+        clear the buffer) as the next agent utterance to transcribe; otherwise None.
+        """
+        if timestamp_ms is None:
+            timestamp_ms = self.last_media_ms + FRAME_MS if self.last_media_ms is not None else 0
+        self.last_media_ms = timestamp_ms
+        self.last_media_at = time.monotonic()
+        if not self.inbound_buffer:
+            self.utterance_start_ms = timestamp_ms
+        self.inbound_buffer.extend(chunk)
+        if self.recorder is not None:
+            self.recorder.add(chunk)
+        self.media_count += 1
+        if self.media_count < MEDIA_BATCH_SIZE or not self.stream_sid:
+            return None
+        self.media_count = 0
+        if len(self.inbound_buffer) < MIN_BUFFER_BYTES:
+            return None
+        return self._take_buffer()
+
+    def take_remaining(self) -> Optional[Utterance]:
+        """At call end: the buffered remainder if long enough to transcribe (buffer is cleared)."""
+        remaining = None
+        if self.stream_sid and len(self.inbound_buffer) >= MIN_FLUSH_BYTES:
+            remaining = self._take_buffer()
+        self.inbound_buffer.clear()
+        return remaining
+
+    def _take_buffer(self) -> Utterance:
+        end_ms = self.last_media_ms + FRAME_MS if self.last_media_ms is not None else None
+        utterance = Utterance(bytes(self.inbound_buffer), self.utterance_start_ms, end_ms)
+        self.inbound_buffer.clear()
+        return utterance
+
+    def mark_stream_start(self) -> None:
+        """The start event is 0 on the media clock (before the first inbound frame arrives)."""
+        self.last_media_ms = 0
+        self.last_media_at = time.monotonic()
+
+    def stream_clock_ms(self) -> Optional[int]:
+        """Current position on the media clock: the latest frame's timestamp plus time since it
+        arrived (frames aren't read while the gevent server is busy with a turn)."""
+        if self.last_media_ms is None:
+            return None
+        return self.last_media_ms + int((time.monotonic() - self.last_media_at) * 1000)
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            "session_id": self.session_id,
+            "state": self.state,
+            "scenario_id": self.scenario_id,
+            "stream_sid": self.stream_sid,
+            "call_sid": self.call_sid,
+            "turns": len(self.conversation),
+            "fillers": len(self.fillers),
+            "profiled": self.profiler is not None,
+            "buffered_bytes": len(self.inbound_buffer),
+            "age_s": round(now - self.created_at, 1),
+            "in_state_s": round(now - self.state_since, 1),
+        }
+
+
+class CallRegistry:
+    """Process-wide set of live sessions (thread/greenlet safe)."""
+
+    def __init__(self, max_calls: int = MAX_CONCURRENT_CALLS):
+        self.max_calls = max_calls  # 0 = unlimited
+        self._lock = threading.Lock()
+        self._sessions: dict[str, CallSession] = {}
+        # Lifetime counters (per process; prefork.py sums them across workers for /metrics)
+        self.opened = 0
+        self.closed = 0
+        self.refused = 0
+
+    def _expire_pending(self) -> None:
+        cutoff = time.time() - PENDING_TTL_SECONDS
+        for sid in [s.session_id for s in self._sessions.values() if s.state == CallState.PENDING and s.created_at < cutoff]:
+            self._sessions.pop(sid).transition(CallState.CLOSED)
+
+    def admit(self, scenario_id: str, reserve: bool = True) -> Optional[CallSession]:
+        """
+        Reserve a slot for a call about to connect; None when the process is full.
+        reserve=False only checks for room (the returned session isn't registered): under prefork
+        the /media stream may land on another worker, which could never claim the reservation.
+        """
+        with self._lock:
+            self._expire_pending()
+            if self.max_calls and len(self._sessions) >= self.max_calls:
+                self.refused += 1
+                return None
+            session = CallSession(CallState.PENDING, scenario_id)
+            if reserve:
+                self._sessions[session.session_id] = session
+            return session
+
+    def open_stream(self, enforce_cap: bool = False) -> Optional[CallSession]:
+        """
+        Register a newly connected /media stream. Normally never refused (its /twiml request was
+        admitted here) and it takes over the oldest reservation's slot until claim(); with
+        enforce_cap (prefork workers, no reservations) None when full.
+        """
+        session = CallSession(CallState.CONNECTED)
+        with self._lock:
+            self._expire_pending()
+            if enforce_cap:
+                if self.max_calls and len(self._sessions) >= self.max_calls:
+                    self.refused += 1
+                    return None
+            else:
+                pending = [s for s in self._sessions.values() if s.state == CallState.PENDING]
+                if pending:
+                    session.reservation = self._sessions.pop(min(pending, key=lambda s: s.created_at).session_id)
+            self._sessions[session.session_id] = session
+            self.opened += 1
+        return session
+
+    def claim(self, session: CallSession, reservation_id: Optional[str]) -> None:
+        """
+        Drop the /twiml reservation now that its stream (session) has its own slot. If the stream
+        took over another call's reservation in open_stream, that one is put back.
+        """
+        with self._lock:
+            held, session.reservation = session.reservation, None
+            if held is not None and held.session_id == reservation_id:
+                held.transition(CallState.CLOSED)
+                return
+            reserved = self._sessions.get(reservation_id) if reservation_id else None
+            if reserved is not None and reserved.state == CallState.PENDING:
+                del self._sessions[reservation_id]
+                reserved.transition(CallState.CLOSED)
+            if held is not None:
+                self._sessions[held.session_id] = held
+
+    def close(self, session: CallSession) -> None:
+        session.transition(CallState.CLOSED)
+        with self._lock:
+            if self._sessions.pop(session.session_id, None) is not None:
+                self.closed += 1
+
+    def active_count(self) -> int:
+        with self._lock:
+            self._expire_pending()
+            return len(self._sessions)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._expire_pending()
+            calls = [s.snapshot() for s in self._sessions.values()]
+        return {
+            "active": len(calls),
+            "max_calls": self.max_calls,
+            "opened": self.opened,
+            "closed": self.closed,
+            "refused": self.refused,
+            "calls": calls,
+        }
+
+
+registry = CallRegistry()
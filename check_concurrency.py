@@ -0,0 +1,108 @@
+"""
+Check that concurrent calls overlap their OpenAI waits instead of queuing behind each other.
+Starts a local stub of the OpenAI API (each request takes STUB_DELAY seconds), points the real
+SDK at it, then runs one turn of process_and_reply for one call and for two calls at once.
+Run: python check_concurrency.py
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+STUB_DELAY = float(os.environ.get("STUB_DELAY", 0.4))
+STUB_PORT = int(os.environ.get("STUB_PORT", 5099))
+
+
+def run_stub(port: int):
+    """Minimal OpenAI-compatible server: Whisper, chat completions and TTS, each delayed."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            time.sleep(STUB_DELAY)
+            if self.path.endswith("/audio/transcriptions"):
+                body, ctype = json.dumps({"text": "Can I get your date of birth?"}).encode(), "application/json"
+            elif self.path.endswith("/chat/completions"):
+                body = json.dumps(
+                    {
+                        "id": "stub",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": "gpt-4o-mini",
+                        "choices": [
+                            {
+                                "index": 0,
+                                "finish_reason": "stop",
+                                "message": {"role": "assistant", "content": "July 14th, 2001."},
+                            }
+                        ],
+                    }
+                ).encode()
+                ctype = "application/json"
+            elif self.path.endswith("/audio/speech"):
+                body, ctype = b"\x00\x00" * 4800, "application/octet-stream"  # 0.2 s of 24 kHz PCM
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def main():
+    stub = subprocess.Popen([sys.executable, __file__, "--stub", str(STUB_PORT)])
+    try:
+        os.environ["OPENAI_API_KEY"] = "stub"
+        os.environ["OPENAI_API_BASE"] = f"http://127.0.0.1:{STUB_PORT}/v1"
+        from gevent import monkey
+
+        monkey.patch_all()
+        import gevent
+
+        from call_sessions import Utterance
+        from server import process_and_reply
+
+        time.sleep(1.0)  # let the stub bind
+
+        def one_call(i: int):
+            sent = []
+            process_and_reply("schedule_new", f"MZcheck{i}", [], Utterance(b"\xff" * 16000, 0, 2000), sent.append)
+            return len(sent)
+
+        one_call(0)  # warm the client and connection pool
+        t0 = time.monotonic()
+        one_call(1)
+        single = time.monotonic() - t0
+
+        t0 = time.monotonic()
+        jobs = [gevent.spawn(one_call, i) for i in (2, 3)]
+        gevent.joinall(jobs)
+        both = time.monotonic() - t0
+    finally:
+        stub.terminate()
+
+    print(f"  one call turn:       {single:.2f}s")
+    print(f"  two concurrent turns: {both:.2f}s (serialized would be ~{2 * single:.2f}s)")
+    if not all(j.value for j in jobs):
+        print("Some turns sent no audio back.")
+        sys.exit(1)
+    if both > 1.5 * single:
+        print("Calls are blocking each other: API waits did not overlap.")
+        sys.exit(1)
+    print("Concurrency OK. API waits overlap across calls.")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--stub":
+        run_stub(int(sys.argv[2]))
+    else:
+        main()
@@ -1,11 +1,16 @@
 """
 Check server health: call /, /health, /twiml with Flask test client (no port needed).
-Run: python check_health.py
+Run: python check_health.py [--connect]
+Warm-up stays offline (no API round trips, no filler rendering) unless --connect is given.
 """
 import sys
 
 def main():
+    import readiness
     from server import app
+
+    readiness.warm_up(connect="--connect" in sys.argv[1:])
+    print(f"  warm-up: {readiness.timings_ms}")
     # Test client does not need a port
     client = app.test_client()
     ok = True
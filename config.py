@@ -13,6 +13,8 @@ TWILIO_WEBHOOK_BASE_URL = os.environ.get("TWILIO_WEBHOOK_BASE_URL", "").rstrip("
 # OpenAI
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 OPENAI_API_BASE = os.environ.get("OPENAI_API_BASE") or None
+# Keep idle API connections this long so the warm-up connection survives until the first turn
+OPENAI_KEEPALIVE_SECONDS = float(os.environ.get("OPENAI_KEEPALIVE_SECONDS", "60"))
 
 # Test line
 TEST_LINE_NUMBER = os.environ.get("TEST_LINE_NUMBER", "+18054398008")
@@ -21,6 +23,21 @@ TEST_LINE_NUMBER = os.environ.get("TEST_LINE_NUMBER", "+18054398008")
 PATIENT_NAME = "Minh Huynh"
 PATIENT_DOB = "July 14th, 2001"
 
+# Patient TTS voice
+PATIENT_VOICE = os.environ.get("VOICE_BOT_VOICE", "nova")
+# Play a filler clip ("mm-hm", "um...") when a reply takes longer than this (0 = never)
+FILLER_AFTER_MS = int(os.environ.get("VOICE_BOT_FILLER_AFTER_MS", "1200"))
+# Load tests only: cache up to this many patient replies per agent line (0 = off; see response_cache.py)
+REPLY_CACHE_SIZE = int(os.environ.get("VOICE_BOT_REPLY_CACHE", "0"))
+# STT model for live turns (2 s chunks). Cheap and fast is fine when post-call re-transcription is on.
+LIVE_STT_MODEL = os.environ.get("VOICE_BOT_LIVE_STT_MODEL", "whisper-1")
+# Post-call re-transcription of the recorded inbound track (needs VOICE_BOT_RECORD_INBOUND=1)
+RETRANSCRIBE = os.environ.get("VOICE_BOT_RETRANSCRIBE", "").strip().lower() in ("1", "true", "yes")
+RETRANSCRIBE_MODEL = os.environ.get("VOICE_BOT_RETRANSCRIBE_MODEL", "whisper-1")  # must support verbose_json segments
+RETRANSCRIBE_WORKERS = int(os.environ.get("VOICE_BOT_RETRANSCRIBE_WORKERS", "2"))
+# Keep the agent's inbound audio as recordings/call_<streamSid>_<scenario>.ulaw (for replay_calls.py)
+RECORD_INBOUND = os.environ.get("VOICE_BOT_RECORD_INBOUND", "").strip().lower() in ("1", "true", "yes")
+
 # Audio: Twilio uses 8kHz mulaw
 SAMPLE_RATE_TWILIO = 8000
 # OpenAI TTS default
@@ -29,5 +46,37 @@ SAMPLE_RATE_TTS = 24000
 # Paths
 TRANSCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "transcripts")
 RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), "recordings")
-os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
-os.makedirs(RECORDINGS_DIR, exist_ok=True)
+FILLERS_DIR = os.path.join(os.path.dirname(__file__), "fillers")
+PROFILES_DIR = os.path.join(os.path.dirname(__file__), "profiles")
+# SQLite full-text/field index over final transcripts (see transcript_index.py)
+TRANSCRIPT_INDEX_PATH = os.path.join(TRANSCRIPTS_DIR, "index.sqlite")
+# Index each final transcript as the servers save it
+INDEX_TRANSCRIPTS = os.environ.get("VOICE_BOT_INDEX_TRANSCRIPTS", "1").strip().lower() in ("1", "true", "yes")
+
+# Per-call profiling (off by default): comma-separated streamSids, "sample:<fraction>" or "all"
+PROFILE_SPEC = os.environ.get("VOICE_BOT_PROFILE", "")
+# /admin/* endpoints require this value in the X-Admin-Token header (unset = /admin/* is disabled)
+ADMIN_TOKEN = os.environ.get("VOICE_BOT_ADMIN_TOKEN", "")
+
+
+def ensure_dirs() -> None:
+    """Create output directories (done at server startup / first write, not on import)."""
+    os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+
+
+# Concurrency: native threads for CPU-bound codec work under gevent (mulaw <-> PCM, WAV)
+AUDIO_POOL_SIZE = int(os.environ.get("VOICE_BOT_AUDIO_POOL_SIZE", "4"))
+
+# Admission control: max concurrent calls per process, i.e. per prefork worker (0 = unlimited). When full, /twiml
+# answers with a polite busy message ("say") or rejects the call ("reject").
+MAX_CONCURRENT_CALLS = int(os.environ.get("VOICE_BOT_MAX_CALLS", "0"))
+BUSY_MODE = os.environ.get("VOICE_BOT_BUSY_MODE", "say").strip().lower()
+
+# Prefork (prefork.py): server.py runs this many worker processes sharing the port (1 = single
+# process). Workers inherit the supervisor's socket, or bind their own with SO_REUSEPORT.
+WORKERS = int(os.environ.get("VOICE_BOT_WORKERS", "1"))
+REUSE_PORT = os.environ.get("VOICE_BOT_REUSE_PORT", "").strip().lower() in ("1", "true", "yes")
+# On SIGTERM/SIGHUP a worker stops accepting and waits up to this long for its calls to end
+DRAIN_SECONDS = float(os.environ.get("VOICE_BOT_DRAIN_SECONDS", "900"))
+METRICS_DIR = os.path.join(os.path.dirname(__file__), "metrics")
@@ -0,0 +1,57 @@
+"""
+Cooperative execution helpers for the gevent media server.
+Blocking sockets become cooperative once server.py monkey-patches; disk writes and
+CPU-heavy codec work do not, so they are handed to native threads here and the
+calling greenlet waits without blocking the hub (other calls keep streaming).
+Without gevent (scripts, Flask test client) everything runs inline.
+server_async.py uses run_cpu_async, which bounds codec work the same way on asyncio.
+"""
+from config import AUDIO_POOL_SIZE
+
+_audio_pool = None
+_async_audio_pool = None
+
+
+def gevent_active() -> bool:
+    """True when gevent has patched the socket module (i.e. running under server.py)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def _pool():
+    global _audio_pool
+    if _audio_pool is None:
+        from gevent.threadpool import ThreadPool
+
+        _audio_pool = ThreadPool(AUDIO_POOL_SIZE)
+    return _audio_pool
+
+
+def run_cpu(fn, *args, **kwargs):
+    """Run CPU-bound audio conversion on the bounded native pool and wait cooperatively."""
+    if not gevent_active():
+        return fn(*args, **kwargs)
+    return _pool().apply(fn, args, kwargs)
+
+
+def run_file_io(fn, *args, **kwargs):
+    """Run blocking file I/O on the hub's thread pool so the hub keeps serving other calls."""
+    if not gevent_active():
+        return fn(*args, **kwargs)
+    import gevent
+
+    return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+
+
+async def run_cpu_async(fn, *args):
+    """asyncio counterpart of run_cpu: bounded executor, the event loop keeps serving calls."""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+
+    global _async_audio_pool
+    if _async_audio_pool is None:
+        _async_audio_pool = ThreadPoolExecutor(AUDIO_POOL_SIZE, thread_name_prefix="audio")
+    return await asyncio.get_running_loop().run_in_executor(_async_audio_pool, fn, *args)
@@ -1,47 +1,153 @@
 """
 Export transcript JSON files to markdown (both sides) for submission.
 Output: transcripts/export/call_*.md
+
+Files are converted in parallel worker processes; a markdown file newer than its JSON is
+left alone (--force rewrites everything). --table also builds the columnar turn table
+transcripts/export/turns.npz (turn_table.py) for aggregate queries; --table-only skips markdown.
+
+  python export_transcripts.py [--workers 4] [--force] [--table | --table-only]
 """
+import argparse
 import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
+from typing import Optional
 
 from config import TRANSCRIPTS_DIR
+from transcript_store import corrected_path, is_corrected
 
 EXPORT_DIR = Path(TRANSCRIPTS_DIR) / "export"
+# Files per task: big enough that pickling results back is cheap next to parsing.
+CHUNK_FILES = 64
+
+
+def transcript_markdown(data: dict) -> str:
+    conv = data.get("transcript") or data.get("conversation") or []
+    lines = [
+        f"# Call: {data.get('call_sid', '?')} — {data.get('scenario_id', '?')}",
+        "",
+        "| Speaker | Text |",
+        "|--------|------|",
+    ]
+    for turn in conv:
+        role = turn.get("role", "")
+        text = (turn.get("text") or "").replace("|", "\\|").replace("\n", " ")
+        label = "Agent" if role == "agent" else "Patient (Minh Huynh)"
+        lines.append(f"| {label} | {text} |")
+    return "\n".join(lines)
+
+
+def export_markdown(path: str, force: bool = False) -> Optional[str]:
+    """Write one call's markdown; None when it is up to date. Raises on unreadable JSON."""
+    src = Path(path)
+    out_path = EXPORT_DIR / src.name.replace(".json", ".md")
+    if not force and out_path.exists() and out_path.stat().st_mtime >= src.stat().st_mtime:
+        return None
+    with open(src, encoding="utf-8") as fp:
+        data = json.load(fp)
+    out_path.write_text(transcript_markdown(data), encoding="utf-8")
+    return str(out_path)
+
+
+def _markdown_chunk(paths: list[str], force: bool) -> list[tuple[str, str, Optional[str]]]:
+    """(source, "wrote"/"skipped"/"failed", output path or error) per file."""
+    out = []
+    for path in paths:
+        try:
+            written = export_markdown(path, force)
+        except Exception as e:
+            out.append((path, "failed", str(e)))
+            continue
+        out.append((path, "wrote" if written else "skipped", written))
+    return out
+
+
+def _table_chunk(paths: list[str]):
+    from turn_table import TurnTable
+
+    items = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as fp:
+                items.append((os.path.basename(path), json.load(fp)))
+        except Exception as e:
+            print("Skip", path, e)
+    return TurnTable.from_transcripts(items)
+
+
+def _chunks(paths: list[str]) -> list[list[str]]:
+    return [paths[i : i + CHUNK_FILES] for i in range(0, len(paths), CHUNK_FILES)]
+
+
+def table_sources(src: Path) -> list[str]:
+    """Final call transcripts, each call once (its .corrected.json when there is one)."""
+    out = []
+    for f in sorted(src.glob("call_*.json")):
+        path = str(f)
+        if f.name.startswith("call_live_"):
+            continue
+        if not is_corrected(path) and os.path.isfile(corrected_path(path)):
+            continue
+        out.append(path)
+    return out
+
+
+def build_table(paths: list[str], workers: int, out_path: str, force: bool = False) -> Optional[str]:
+    """Parse paths in worker processes into one TurnTable; None if out_path is already current."""
+    import numpy as np
+
+    from turn_table import TurnTable
+
+    if not force and os.path.isfile(out_path):
+        built_at = os.path.getmtime(out_path)
+        if all(os.path.getmtime(p) <= built_at for p in paths):
+            with np.load(out_path, allow_pickle=False) as data:
+                files = data["calls_file"]  # .npz members load separately: no need to read the turns
+            if sorted(files) == sorted(os.path.basename(p) for p in paths):
+                return None
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        parts = list(pool.map(_table_chunk, _chunks(paths)))
+    table = TurnTable.concat(parts)
+    table.save(out_path)
+    return out_path
 
 
 def main():
+    ap = argparse.ArgumentParser(description="Export transcripts to markdown and/or a columnar turn table")
+    ap.add_argument("--workers", type=int, default=4, help="Parallel export processes")
+    ap.add_argument("--force", action="store_true", help="Rewrite outputs even if newer than their transcripts")
+    ap.add_argument("--table", action="store_true", help="Also build transcripts/export/turns.npz")
+    ap.add_argument("--table-only", action="store_true", help="Only build the turn table")
+    args = ap.parse_args()
+
     EXPORT_DIR.mkdir(parents=True, exist_ok=True)
     src = Path(TRANSCRIPTS_DIR)
     if not src.exists():
         print("No transcripts dir:", TRANSCRIPTS_DIR)
         return
-    count = 0
-    for f in sorted(src.glob("*.json")):
-        try:
-            with open(f, encoding="utf-8") as fp:
-                data = json.load(fp)
-        except Exception as e:
-            print("Skip", f, e)
-            continue
-        conv = data.get("transcript") or data.get("conversation") or []
-        lines = [
-            f"# Call: {data.get('call_sid', '?')} — {data.get('scenario_id', '?')}",
-            "",
-            "| Speaker | Text |",
-            "|--------|------|",
-        ]
-        for turn in conv:
-            role = turn.get("role", "")
-            text = (turn.get("text") or "").replace("|", "\\|").replace("\n", " ")
-            label = "Agent" if role == "agent" else "Patient (Minh Huynh)"
-            lines.append(f"| {label} | {text} |")
-        out_name = f.name.replace(".json", ".md")
-        out_path = EXPORT_DIR / out_name
-        out_path.write_text("\n".join(lines), encoding="utf-8")
-        count += 1
-        print("Wrote", out_path)
-    print(f"Exported {count} transcript(s) to {EXPORT_DIR}")
+
+    if not args.table_only:
+        paths = [str(f) for f in sorted(src.glob("*.json"))]
+        counts = {"wrote": 0, "skipped": 0, "failed": 0}
+        with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            for results in pool.map(partial(_markdown_chunk, force=args.force), _chunks(paths)):
+                for path, status, detail in results:
+                    counts[status] += 1
+                    if status == "wrote":
+                        print("Wrote", detail)
+                    elif status == "failed":
+                        print("Skip", path, detail)
+        print(f"Exported {counts['wrote']} transcript(s) to {EXPORT_DIR} ({counts['skipped']} unchanged)")
+
+    if args.table or args.table_only:
+        from turn_table import TABLE_PATH, TurnTable, print_summary
+
+        out = build_table(table_sources(src), args.workers, TABLE_PATH, args.force)
+        print("Wrote", out if out else f"nothing: {TABLE_PATH} is up to date")
+        print_summary(TurnTable.load(TABLE_PATH))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+"""
+Filler / backchannel clips ("mm-hm", "um...", "okay") that mask STT -> LLM -> TTS latency.
+Clips are rendered once per voice with OpenAI TTS into FILLERS_DIR/<voice>/<name>.ulaw
+(8 kHz mulaw) and loaded into memory at startup, already split into Twilio frames.
+When a reply is slower than VOICE_BOT_FILLER_AFTER_MS, one clip is played and the real
+reply is queued right behind it. Played fillers are logged per call, separately from
+the transcript turns.
+Render clips ahead of time: python fillers.py [--voice nova] [--force]
+"""
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+from typing import Optional
+
+from audio_utils import mulaw_chunks_to_base64
+from config import FILLER_AFTER_MS, FILLERS_DIR, OPENAI_API_KEY, PATIENT_VOICE
+from twilio_media import media_message
+
+logger = logging.getLogger(__name__)
+
+FILLER_PHRASES = {
+    "mm-hm": "Mm-hm.",
+    "um": "Um...",
+    "okay": "Okay.",
+    "yeah": "Yeah.",
+}
+
+# voice -> {clip name -> base64 frames}
+_library: dict[str, dict[str, list[str]]] = {}
+
+
+def _clip_path(voice: str, name: str) -> str:
+    return os.path.join(FILLERS_DIR, voice, f"{name}.ulaw")
+
+
+def render(voice: str = PATIENT_VOICE, force: bool = False) -> list[str]:
+    """Render missing clips for voice with TTS; returns the names written."""
+    from stt_tts import text_to_mulaw
+
+    os.makedirs(os.path.join(FILLERS_DIR, voice), exist_ok=True)
+    written = []
+    for name, text in FILLER_PHRASES.items():
+        path = _clip_path(voice, name)
+        if os.path.isfile(path) and not force:
+            continue
+        mulaw = text_to_mulaw(text, voice=voice)
+        if mulaw:
+            with open(path, "wb") as f:
+                f.write(mulaw)
+            written.append(name)
+    return written
+
+
+def load_library(voice: str = PATIENT_VOICE, render_missing: bool = True) -> int:
+    """Load voice's clips into memory (rendering missing ones if an API key is set)."""
+    if render_missing and OPENAI_API_KEY:
+        try:
+            render(voice)
+        except Exception as e:
+            logger.warning("Could not render filler clips: %s", e)
+    clips = {}
+    for name in FILLER_PHRASES:
+        path = _clip_path(voice, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                clips[name] = mulaw_chunks_to_base64(f.read())
+    _library[voice] = clips
+    logger.info("Loaded %d filler clip(s) for voice %s", len(clips), voice)
+    return len(clips)
+
+
+def pick(voice: str = PATIENT_VOICE) -> Optional[tuple[str, list[str]]]:
+    """A random loaded clip as (name, base64 frames), or None if none are loaded."""
+    clips = _library.get(voice)
+    if not clips:
+        return None
+    name = random.choice(list(clips))
+    return name, clips[name]
+
+
+def filler_record(name: str, after_turn: int) -> dict:
+    """Entry for the transcript's "fillers" list (kept apart from real turns)."""
+    return {"clip": name, "text": FILLER_PHRASES[name], "after_turn": after_turn, "at": round(time.time(), 3)}
+
+
+class FillerPlayer:
+    """
+    One turn's filler for the gevent server: arm() starts a timer that plays a clip through
+    send_fn if the reply is not ready in time; finish() cancels it, or waits for a clip that
+    is already playing so the reply frames go out strictly after it.
+    """
+
+    def __init__(self, stream_sid: str, send_fn, log: list, voice: str = PATIENT_VOICE, after_ms: int = FILLER_AFTER_MS):
+        self.stream_sid = stream_sid
+        self.send_fn = send_fn
+        self.log = log
+        self.voice = voice
+        self.after_ms = after_ms
+        self.after_turn = 0
+        self._timer: Optional[threading.Timer] = None
+
+    def arm(self, elapsed_ms: float, after_turn: int) -> None:
+        """Start the timer; elapsed_ms of the turn has already gone by (e.g. in STT)."""
+        if self.after_ms <= 0 or not _library.get(self.voice):
+            return
+        self.after_turn = after_turn
+        self._timer = threading.Timer(max(0.0, self.after_ms - elapsed_ms) / 1000, self._play)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _play(self) -> None:
+        clip = pick(self.voice)
+        if clip is None:
+            return
+        name, frames = clip
+        for payload in frames:
+            try:
+                self.send_fn(media_message(self.stream_sid, payload))
+            except Exception as e:
+                logger.warning("Send filler failed: %s", e)
+                return
+        self.log.append(filler_record(name, self.after_turn))
+
+    def finish(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer.join()
+            self._timer = None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Render filler clips with OpenAI TTS")
+    ap.add_argument("--voice", default=PATIENT_VOICE)
+    ap.add_argument("--force", action="store_true", help="Re-render clips that already exist")
+    args = ap.parse_args()
+    if not OPENAI_API_KEY:
+        print("Set OPENAI_API_KEY in .env")
+        return
+    written = render(args.voice, force=args.force)
+    print(f"Rendered {len(written)} clip(s) to {os.path.join(FILLERS_DIR, args.voice)}: {', '.join(written) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
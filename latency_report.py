@@ -0,0 +1,186 @@
+"""
+Response-latency analytics over saved transcripts (turns with start_ms/end_ms and stage times).
+  agent_response    agent turn start - end of the patient turn before it (the office agent's latency)
+  patient_response  patient turn start - end of the agent turn before it (our STT + LLM + TTS + endpointing)
+  stt_ms / llm_ms / tts_ms   our pipeline stage durations
+Distributions are per scenario and overall. Files are read one at a time into fixed-size
+histograms (~10% wide buckets), so memory stays flat however many transcripts there are;
+percentiles are accurate to a bucket. When a call has a .corrected.json (retranscribe.py), its
+one-pass agent timings are used for the response gaps; stage times still come from the live file.
+
+Usage: python latency_report.py [--dir transcripts] [--pattern "call_*.json"] [--json out.json]
+"""
+import argparse
+import bisect
+import json
+import logging
+import os
+from fnmatch import fnmatch
+
+from config import TRANSCRIPTS_DIR
+from transcript_store import is_corrected, preferred_path
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper edges in ms: 0, then ~10% steps from 10 ms to past 2 minutes.
+EDGES = [0]
+while EDGES[-1] < 120_000:
+    EDGES.append(max(EDGES[-1] + 10, round(EDGES[-1] * 1.1)))
+
+METRICS = ("agent_response", "patient_response", "stt_ms", "llm_ms", "tts_ms")
+ALL = "ALL"
+
+
+class Histogram:
+    """Fixed-bucket histogram; negative values (overlapping speech) land in their own bucket."""
+
+    __slots__ = ("counts", "negative", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(EDGES) + 1)
+        self.negative = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value < 0:
+            self.negative += 1
+        else:
+            self.counts[bisect.bisect_left(EDGES, value)] += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper edge of the bucket holding the q-th value (min/max at the extremes)."""
+        rank = q * self.count
+        seen = self.negative
+        if rank <= seen:
+            return self.min
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(EDGES[i] if i < len(EDGES) else self.max, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1),
+            "p50": round(self.quantile(0.5), 1),
+            "p90": round(self.quantile(0.9), 1),
+            "p99": round(self.quantile(0.99), 1),
+            "min": round(self.min, 1),
+            "max": round(self.max, 1),
+            "overlaps": self.negative,
+        }
+
+
+class LatencyStats:
+    def __init__(self):
+        self.hists: dict[tuple[str, str], Histogram] = {}
+        self.files = 0
+        self.skipped = 0
+
+    def _add(self, scenario: str, metric: str, value) -> None:
+        if not isinstance(value, (int, float)):
+            return
+        for key in ((scenario, metric), (ALL, metric)):
+            hist = self.hists.get(key)
+            if hist is None:
+                hist = self.hists[key] = Histogram()
+            hist.add(value)
+
+    def add_transcript(self, data: dict, corrected: dict = None) -> None:
+        """corrected: the call's re-transcribed version, whose turn boundaries replace the live ones."""
+        scenario = data.get("scenario_id") or "?"
+        for turn in data.get("transcript") or []:
+            for stage in ("stt_ms", "llm_ms", "tts_ms"):
+                self._add(scenario, stage, turn.get(stage))
+        previous = None
+        for turn in (corrected or data).get("transcript") or []:
+            role = turn.get("role")
+            start = turn.get("start_ms")
+            if previous is not None and start is not None and previous.get("role") != role:
+                end = previous.get("end_ms")
+                if end is not None:
+                    self._add(scenario, f"{role}_response", start - end)
+            if start is not None:
+                previous = turn
+        self.files += 1
+
+    def add_file(self, path: str) -> None:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            corrected = None
+            best = preferred_path(path)
+            if best != path:
+                with open(best, encoding="utf-8") as f:
+                    corrected = json.load(f)
+        except Exception as e:
+            self.skipped += 1
+            logger.warning("Skip %s: %s", path, e)
+            return
+        self.add_transcript(data, corrected)
+
+    def report(self) -> dict:
+        scenarios = sorted({s for s, _ in self.hists}, key=lambda s: (s != ALL, s))
+        return {
+            "files": self.files,
+            "skipped": self.skipped,
+            "scenarios": {
+                s: {m: self.hists[(s, m)].summary() for m in METRICS if (s, m) in self.hists} for s in scenarios
+            },
+        }
+
+
+def iter_files(directory: str, pattern: str):
+    """Paths of matching transcripts, streamed (call_live_* files are still being written;
+    .corrected.json files are read alongside their live transcript)."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not fnmatch(entry.name, pattern) or entry.name.startswith("call_live_") or is_corrected(entry.name):
+                continue
+            if entry.is_file():
+                yield entry.path
+
+
+def print_report(report: dict) -> None:
+    print(f"{report['files']} transcript(s), {report['skipped']} skipped. Milliseconds:")
+    print(f"  {'scenario':<20} {'metric':<17} {'n':>7} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'overlap':>8}")
+    for scenario, metrics in report["scenarios"].items():
+        for metric, s in metrics.items():
+            if not s["count"]:
+                continue
+            print(
+                f"  {scenario:<20} {metric:<17} {s['count']:>7} {s['mean']:>8} {s['p50']:>8} "
+                f"{s['p90']:>8} {s['p99']:>8} {s['overlaps']:>8}"
+            )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Agent and patient response latency across transcripts")
+    ap.add_argument("--dir", default=TRANSCRIPTS_DIR)
+    ap.add_argument("--pattern", default="call_*.json")
+    ap.add_argument("--json", default="", help="Also write the report as JSON here")
+    args = ap.parse_args()
+
+    stats = LatencyStats()
+    for path in iter_files(args.dir, args.pattern):
+        stats.add_file(path)
+    report = stats.report()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print("Wrote", args.json)
+
+
+if __name__ == "__main__":
+    main()
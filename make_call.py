@@ -4,7 +4,6 @@ Usage: python make_call.py [scenario_id]
 Default scenario: schedule_new
 """
 import sys
-from twilio.rest import Client
 
 from config import (
     TWILIO_ACCOUNT_SID,
@@ -28,6 +27,8 @@ def main():
         print("Set TWILIO_WEBHOOK_BASE_URL (e.g. https://xxx.ngrok.io) in .env")
         sys.exit(1)
 
+    from twilio.rest import Client  # imported only once the config checks pass
+
     twiml_url = f"{TWILIO_WEBHOOK_BASE_URL}/twiml?scenario_id={scenario_id}"
     client = Client(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
     call = client.calls.create(
@@ -0,0 +1,163 @@
+"""
+Local stand-ins for the medical office's AI agent, for text-only simulation (simulate_calls.py).
+An agent sees the conversation so far ({"role": "agent"|"patient", "text"} turns) and returns
+its next line, or None to hang up. Any class with that reply() method can be plugged in with
+--agent module:ClassName.
+"""
+import re
+from typing import Optional
+
+from config import PATIENT_DOB
+
+
+class OfficeAgent:
+    """Base class: one instance per simulated conversation."""
+
+    name = "base"
+
+    def reply(self, conversation: list[dict]) -> Optional[str]:
+        raise NotImplementedError
+
+
+class ScriptedAgent(OfficeAgent):
+    """Says the same lines in order whatever the patient says, then hangs up."""
+
+    name = "scripted"
+    SCRIPT = (
+        "Thank you for calling. How can I help you today?",
+        "Sure, I can help with that. Can I have your full name?",
+        "Thanks. And your date of birth?",
+        "Got it. I've taken care of that for you.",
+        "Is there anything else I can help with?",
+        "Thanks for calling, have a great day. Goodbye.",
+    )
+
+    def __init__(self):
+        self._next = 0
+
+    def reply(self, conversation: list[dict]) -> Optional[str]:
+        if self._next >= len(self.SCRIPT):
+            return None
+        line = self.SCRIPT[self._next]
+        self._next += 1
+        return line
+
+
+_INTENTS = (
+    ("reschedule", re.compile(r"\breschedul|\bmove\b|\bchange\b.*\b(appointment|time)")),
+    ("cancel", re.compile(r"\bcancel")),
+    ("refill", re.compile(r"\brefill|prescription|medication|medicine")),
+    ("hours", re.compile(r"\bhours?\b|\bopen\b|\bclose")),
+    ("location", re.compile(r"\baddress|\blocat|\bwhere\b|directions")),
+    ("insurance", re.compile(r"insurance|blue cross|\baetna|\bcigna|\bcover")),
+    ("schedule", re.compile(r"appointment|\bbook|schedul|\bsee (the )?doctor")),
+)
+_NEEDS_IDENTITY = {"schedule", "reschedule", "cancel", "refill"}
+_DONE = re.compile(r"\b(no,? that'?s (it|all)|that'?s (it|all)|nothing else|bye|no thanks?|no,? thank)")
+_DOB = re.compile(r"\b(19|20)\d\d\b|" + re.escape(PATIENT_DOB.split()[0].lower()))
+_TIME = re.compile(r"\b(morning|afternoon|monday|tuesday|wednesday|thursday|friday|\d{1,2}(:\d\d)?\s*(am|pm)?)\b", re.I)
+
+_ANSWERS = {
+    "hours": "We're open Monday through Friday, 8 AM to 5 PM, and Saturday 9 to noon.",
+    "location": "We're at 1200 Main Street, Suite 300. There's parking behind the building.",
+    "insurance": "Yes, we accept Blue Cross Blue Shield, Aetna, Cigna and most PPO plans.",
+    "cancel": "Okay, I've cancelled your appointment on Thursday at 10 AM.",
+    "refill": "I've sent the refill request to the doctor; the pharmacy should have it within two business days.",
+}
+
+
+class RuleBasedAgent(OfficeAgent):
+    """Keyword-driven office bot: works out the request, verifies name and DOB when needed,
+    offers times for (re)scheduling, answers, then asks if there's anything else."""
+
+    name = "rules"
+    MAX_TURNS = 14
+
+    def __init__(self):
+        self.pending: list[str] = []  # intents heard but not handled yet
+        self.handled: set[str] = set()
+        self.have_name = False
+        self.have_dob = False
+        self.awaiting: Optional[str] = None  # "name", "dob", "time", "anything_else"
+        self.turns = 0
+        self.said_goodbye = False
+
+    def _hear(self, text: str) -> None:
+        for intent, pattern in _INTENTS:
+            if pattern.search(text) and intent not in self.handled and intent not in self.pending:
+                # "reschedule my appointment" is not also a new booking
+                if intent == "schedule" and "reschedule" in self.pending:
+                    continue
+                self.pending.append(intent)
+
+    def reply(self, conversation: list[dict]) -> Optional[str]:
+        if self.said_goodbye:
+            return None
+        self.turns += 1
+        last = next((t["text"] for t in reversed(conversation) if t.get("role") == "patient"), "")
+        text = last.lower()
+        if self.turns > self.MAX_TURNS:
+            return self._goodbye()
+
+        if self.awaiting == "name":
+            self.have_name = bool(text.strip())
+        elif self.awaiting == "dob":
+            if not _DOB.search(text):
+                return "Sorry, I didn't get that. What's your date of birth?"
+            self.have_dob = True
+        elif self.awaiting == "time":
+            if not _TIME.search(text):
+                return "What day or time works best for you?"
+            self.handled.add(self.pending.pop(0))
+            when = _TIME.search(last).group(0)
+            return f"Great, you're booked for {when}. You'll get a text confirmation." + self._next_step()
+        elif self.awaiting == "anything_else" and _DONE.search(text):
+            return self._goodbye()
+        self._hear(text)
+        self.awaiting = None
+
+        if not self.pending:
+            if self.turns == 1:
+                self.awaiting = "anything_else"
+                return "Thank you for calling. How can I help you today?"
+            self.awaiting = "anything_else"
+            return "Is there anything else I can help you with?"
+
+        intent = self.pending[0]
+        if intent in _NEEDS_IDENTITY and not self.have_name:
+            self.awaiting = "name"
+            return "I can help with that. Can I get your full name, please?"
+        if intent in _NEEDS_IDENTITY and not self.have_dob:
+            self.awaiting = "dob"
+            return "Thanks. And your date of birth?"
+        if intent in ("schedule", "reschedule"):
+            self.awaiting = "time"
+            return "I have Tuesday at 9 AM or Thursday at 2 PM. Which works better?"
+        self.handled.add(self.pending.pop(0))
+        return _ANSWERS[intent] + self._next_step()
+
+    def _next_step(self) -> str:
+        if self.pending:
+            self.awaiting = None
+            return " Now, about your other request."
+        self.awaiting = "anything_else"
+        return " Anything else I can help with?"
+
+    def _goodbye(self) -> str:
+        self.said_goodbye = True
+        return "Thanks for calling. Have a great day, goodbye."
+
+
+AGENTS = {cls.name: cls for cls in (ScriptedAgent, RuleBasedAgent)}
+
+
+def load_agent(spec: str) -> type:
+    """Agent class from a built-in name ("rules", "scripted") or "module:ClassName"."""
+    if spec in AGENTS:
+        return AGENTS[spec]
+    if ":" not in spec:
+        raise ValueError(f"Unknown agent {spec!r}; use one of {sorted(AGENTS)} or module:ClassName")
+    import importlib
+
+    module, cls = spec.split(":", 1)
+    return getattr(importlib.import_module(module), cls)
@@ -0,0 +1,40 @@
+"""
+Shared construction of the OpenAI clients used by stt_tts.py and patient_bot.py.
+openai (and httpx under it) is imported only when a client is first built, so scripts that
+never call the API don't pay for it. Keep-alive connections are held longer than httpx's
+5 s default so the connection opened during warm-up is still there for the first turn.
+"""
+from config import OPENAI_API_BASE, OPENAI_API_KEY, OPENAI_KEEPALIVE_SECONDS
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=OPENAI_KEEPALIVE_SECONDS)
+
+
+def make_client():
+    from openai import DefaultHttpxClient, OpenAI
+
+    kwargs = {"api_key": OPENAI_API_KEY, "http_client": DefaultHttpxClient(limits=_limits())}
+    if OPENAI_API_BASE:
+        kwargs["base_url"] = OPENAI_API_BASE
+    return OpenAI(**kwargs)
+
+
+def make_async_client():
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    kwargs = {"api_key": OPENAI_API_KEY, "http_client": DefaultAsyncHttpxClient(limits=_limits())}
+    if OPENAI_API_BASE:
+        kwargs["base_url"] = OPENAI_API_BASE
+    return AsyncOpenAI(**kwargs)
+
+
+def open_connection(client) -> None:
+    """Do the TLS handshake now with a cheap request; the connection stays in the pool."""
+    client.with_options(timeout=10.0, max_retries=0).models.list()
+
+
+async def open_connection_async(client) -> None:
+    await client.with_options(timeout=10.0, max_retries=0).models.list()
@@ -2,28 +2,42 @@
 Patient bot: LLM that generates natural patient responses given conversation history and scenario.
 """
 import logging
-from typing import Optional
+import threading
+from typing import TYPE_CHECKING, Optional
 
-from openai import OpenAI
-
-from config import OPENAI_API_KEY, OPENAI_API_BASE, PATIENT_NAME, PATIENT_DOB
+import response_cache
+from config import PATIENT_NAME, PATIENT_DOB
+from openai_clients import make_async_client, make_client
+from profiling import span
 from scenarios import Scenario, get_scenario
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
+
 logger = logging.getLogger(__name__)
 
-_client: Optional[OpenAI] = None
+_client: Optional["OpenAI"] = None
+_async_client: Optional["AsyncOpenAI"] = None
+
+# Chat requests and tokens used by this process (see usage_snapshot)
+_usage_lock = threading.Lock()
+_usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0}
 
 
-def _client_or_default() -> OpenAI:
+def _client_or_default() -> "OpenAI":
     global _client
     if _client is None:
-        kwargs = {"api_key": OPENAI_API_KEY}
-        if OPENAI_API_BASE:
-            kwargs["base_url"] = OPENAI_API_BASE
-        _client = OpenAI(**kwargs)
+        _client = make_client()
     return _client
 
 
+def _async_client_or_default() -> "AsyncOpenAI":
+    global _async_client
+    if _async_client is None:
+        _async_client = make_async_client()
+    return _async_client
+
+
 SYSTEM_TEMPLATE = """You are {name}, DOB {dob}. You are on a phone call with a medical office's AI agent. Speak as a real patient: short, natural phrases. One or two sentences per turn. Do not list options or be formal. No "I would like to..." unless natural. You can say "um", "yeah", "okay". Never break the fourth wall or mention you are an AI.
 
 Scenario goal: {goal}
@@ -41,15 +55,7 @@ def build_system_prompt(scenario: Scenario) -> str:
     )
 
 
-def patient_response(
-    scenario_id: str,
-    conversation: list[dict],
-    last_agent_text: str,
-) -> str:
-    """
-    Given scenario and conversation history (list of {"role": "agent"|"patient", "text": "..."}),
-    and the latest agent utterance, return the next patient utterance.
-    """
+def _build_messages(scenario_id: str, conversation: list[dict], last_agent_text: str) -> list[dict]:
     scenario = get_scenario(scenario_id)
     if not scenario:
         scenario = Scenario(
@@ -67,20 +73,100 @@ def patient_response(
         messages.append({"role": role, "content": turn["text"]})
 
     messages.append({"role": "user", "content": f"Agent said: {last_agent_text}"})
+    return messages
+
+
+def _count_usage(r) -> None:
+    u = getattr(r, "usage", None)
+    with _usage_lock:
+        _usage["requests"] += 1
+        if u is not None:
+            _usage["prompt_tokens"] += u.prompt_tokens or 0
+            _usage["completion_tokens"] += u.completion_tokens or 0
+
+
+def usage_snapshot(reset: bool = False) -> dict:
+    """Chat requests and prompt/completion tokens since start (or the last reset)."""
+    with _usage_lock:
+        snap = dict(_usage)
+        if reset:
+            for k in _usage:
+                _usage[k] = 0
+    return snap
+
+
+def _clean_reply(content: Optional[str]) -> str:
+    text = (content or "").strip()
+    # Remove any accidental quotes
+    if text.startswith('"') and text.endswith('"'):
+        text = text[1:-1]
+    return text
+
 
+FALLBACK_REPLY = "Sorry, I didn't catch that. Can you repeat?"
+
+
+def patient_response(
+    scenario_id: str,
+    conversation: list[dict],
+    last_agent_text: str,
+) -> str:
+    """
+    Given scenario and conversation history (list of {"role": "agent"|"patient", "text": "..."}),
+    and the latest agent utterance, return the next patient utterance.
+    """
+    cache = response_cache.current()
+    if cache is not None:
+        key = cache.key(scenario_id, conversation, last_agent_text)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    messages = _build_messages(scenario_id, conversation, last_agent_text)
     try:
         client = _client_or_default()
-        r = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=150,
-            temperature=0.8,
-        )
-        text = (r.choices[0].message.content or "").strip()
-        # Remove any accidental quotes
-        if text.startswith('"') and text.endswith('"'):
-            text = text[1:-1]
-        return text
+        with span("llm.chat_wait"):
+            r = client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=150,
+                temperature=0.8,
+            )
+        _count_usage(r)
+        reply = _clean_reply(r.choices[0].message.content)
+        if cache is not None and reply:
+            cache.put(key, reply)
+        return reply
+    except Exception as e:
+        logger.warning("Patient LLM failed: %s", e)
+        return FALLBACK_REPLY
+
+
+async def patient_response_async(
+    scenario_id: str,
+    conversation: list[dict],
+    last_agent_text: str,
+) -> str:
+    """asyncio version of patient_response (AsyncOpenAI)."""
+    cache = response_cache.current()
+    if cache is not None:
+        key = cache.key(scenario_id, conversation, last_agent_text)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    messages = _build_messages(scenario_id, conversation, last_agent_text)
+    try:
+        with span("llm.chat_wait"):
+            r = await _async_client_or_default().chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                max_tokens=150,
+                temperature=0.8,
+            )
+        _count_usage(r)
+        reply = _clean_reply(r.choices[0].message.content)
+        if cache is not None and reply:
+            cache.put(key, reply)
+        return reply
     except Exception as e:
         logger.warning("Patient LLM failed: %s", e)
-        return "Sorry, I didn't catch that. Can you repeat?"
+        return FALLBACK_REPLY
@@ -0,0 +1,332 @@
+"""
+Prefork mode for server.py: with VOICE_BOT_WORKERS=N `python server.py` becomes a supervisor that runs N copies of the server on the same port.
+
+- Listening socket: the supervisor binds it once and each worker inherits the descriptor
+  (the kernel hands connections to whichever worker accepts first). With VOICE_BOT_REUSE_PORT=1
+  each worker binds its own SO_REUSEPORT socket instead and the kernel balances by hash; note
+  connections already queued on a worker's socket are reset when it drains, inheritance loses none.
+- Restarts: a worker that dies is started again (with back-off if it keeps dying at startup).
+- Drain: SIGTERM stops the supervisor and SIGHUP restarts every worker (e.g. after a deploy,
+  one new worker is started before each old one drains). A draining worker stops accepting and
+  exits when its /media streams have ended, or after VOICE_BOT_DRAIN_SECONDS.
+- Metrics: each worker writes a snapshot to metrics/worker_<pid>.json every couple of
+  seconds; /metrics on any worker sums the live ones.
+
+Sessions and /calls stay per worker, and VOICE_BOT_MAX_CALLS is a cap per worker (N workers
+take up to N x MAX_CALLS). A /twiml reservation can't follow its call, because the /media
+connection may reach another worker. So workers don't reserve: /twiml only checks that worker
+has room, and the cap is enforced when the stream opens (over it, the socket is closed). The
+supervisor itself imports nothing but config, so it never monkey-patches or opens API clients.
+"""
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+from config import DRAIN_SECONDS, METRICS_DIR, REUSE_PORT, WORKERS
+
+logger = logging.getLogger(__name__)
+
+WORKER_ENV = "VOICE_BOT_WORKER_ID"
+LISTEN_FD_ENV = "VOICE_BOT_LISTEN_FD"
+METRICS_INTERVAL = 2.0
+LISTEN_BACKLOG = 1024
+# A worker that exits sooner than this after starting is crashing at startup: back off.
+MIN_UPTIME_SECONDS = 5.0
+MAX_BACKOFF_SECONDS = 30.0
+_SUMMED = ("active", "streams", "opened", "closed", "refused")
+
+
+def is_worker() -> bool:
+    return WORKER_ENV in os.environ
+
+
+def supervising() -> bool:
+    """True when this process should run the supervisor rather than serve."""
+    return WORKERS > 1 and not is_worker()
+
+
+def bind(port: int, reuse_port: bool = False) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("", port))
+    sock.listen(LISTEN_BACKLOG)
+    return sock
+
+
+# --- supervisor ---
+
+
+class Supervisor:
+    """Runs and restarts `workers` copies of command, each with VOICE_BOT_WORKER_ID set."""
+
+    def __init__(
+        self,
+        command: list[str],
+        port: int,
+        workers: int = WORKERS,
+        reuse_port: bool = REUSE_PORT,
+        drain_seconds: float = DRAIN_SECONDS,
+    ):
+        self.command = command
+        self.port = port
+        self.count = workers
+        self.reuse_port = reuse_port
+        self.drain_seconds = drain_seconds
+        self.listener: Optional[socket.socket] = None
+        self.workers: dict[int, subprocess.Popen] = {}  # slot -> process
+        self.started_at: dict[int, float] = {}
+        self.failures: dict[int, int] = {}  # slot -> consecutive startup crashes
+        self.respawn_at: dict[int, float] = {}
+        self.draining: list[subprocess.Popen] = []
+        self._stopping = False
+        self._reload = False
+
+    def _spawn(self, slot: int) -> None:
+        env = dict(os.environ)
+        env[WORKER_ENV] = str(slot)
+        pass_fds = ()
+        if self.listener is not None:
+            env[LISTEN_FD_ENV] = str(self.listener.fileno())
+            pass_fds = (self.listener.fileno(),)
+        proc = subprocess.Popen(self.command, env=env, pass_fds=pass_fds)
+        self.workers[slot] = proc
+        self.started_at[slot] = time.monotonic()
+        logger.info("Worker %d started (pid %d)", slot, proc.pid)
+
+    def _on_signal(self, signum, frame) -> None:
+        if signum == signal.SIGHUP:
+            self._reload = True
+        else:
+            self._stopping = True
+
+    def _rolling_restart(self) -> None:
+        """Start a fresh worker per slot, then drain the old one (capacity never dips)."""
+        self._reload = False
+        logger.info("Restarting %d worker(s)", len(self.workers))
+        for slot, old in list(self.workers.items()):
+            self._spawn(slot)
+            if old.poll() is None:
+                old.send_signal(signal.SIGTERM)
+                self.draining.append(old)
+
+    def _reap(self) -> None:
+        now = time.monotonic()
+        for slot, proc in list(self.workers.items()):
+            code = proc.poll()
+            if code is None:
+                if now - self.started_at[slot] >= MIN_UPTIME_SECONDS:
+                    self.failures[slot] = 0
+                continue
+            _remove_metrics(proc.pid)
+            del self.workers[slot]
+            if now - self.started_at[slot] < MIN_UPTIME_SECONDS:
+                self.failures[slot] = self.failures.get(slot, 0) + 1
+            delay = min(MAX_BACKOFF_SECONDS, 2 ** self.failures.get(slot, 0) - 1)
+            self.respawn_at[slot] = now + delay
+            logger.warning("Worker %d (pid %d) exited with %s; restarting in %.0fs", slot, proc.pid, code, delay)
+        for slot, at in list(self.respawn_at.items()):
+            if at <= now:
+                del self.respawn_at[slot]
+                self._spawn(slot)
+        for proc in list(self.draining):
+            if proc.poll() is not None:
+                _remove_metrics(proc.pid)
+                self.draining.remove(proc)
+                logger.info("Drained worker pid %d exited", proc.pid)
+
+    def _shutdown(self) -> None:
+        procs = [p for p in list(self.workers.values()) + self.draining if p.poll() is None]
+        logger.info("Draining %d worker(s) (up to %.0fs)", len(procs), self.drain_seconds)
+        for proc in procs:
+            proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.drain_seconds + 10
+        for proc in procs:
+            try:
+                proc.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning("Worker pid %d did not drain in time; killing", proc.pid)
+                proc.kill()
+                proc.wait()
+            _remove_metrics(proc.pid)
+
+    def run(self) -> int:
+        if not self.reuse_port:
+            self.listener = bind(self.port)
+        for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(signum, self._on_signal)
+        mode = "SO_REUSEPORT" if self.reuse_port else "shared socket"
+        logger.info("Supervisor pid %d: %d worker(s) on port %s (%s)", os.getpid(), self.count, self.port, mode)
+        for slot in range(self.count):
+            self._spawn(slot)
+        while not self._stopping:
+            if self._reload:
+                self._rolling_restart()
+            self._reap()
+            time.sleep(0.5)
+        self._shutdown()
+        if self.listener is not None:
+            self.listener.close()
+        return 0
+
+
+def supervise(script: str, port: int) -> int:
+    """Entry point for `python server.py` with VOICE_BOT_WORKERS > 1."""
+    return Supervisor([sys.executable, script], port).run()
+
+
+# --- worker side (gevent, inside server.py) ---
+
+
+def worker_listener(port: int) -> Optional[socket.socket]:
+    """The socket a worker serves on (inherited or its own SO_REUSEPORT one); None outside prefork."""
+    fd = os.environ.get(LISTEN_FD_ENV)
+    if fd:
+        return socket.socket(fileno=int(fd))
+    if is_worker() and REUSE_PORT:
+        return bind(port, reuse_port=True)
+    return None
+
+
+def _metrics_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"worker_{pid}.json")
+
+
+def _remove_metrics(pid: int) -> None:
+    try:
+        os.remove(_metrics_path(pid))
+    except FileNotFoundError:
+        pass
+
+
+def write_metrics(snapshot: dict) -> None:
+    """Atomically replace this worker's metrics file."""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _metrics_path(os.getpid())
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _stream_count(registry) -> int:
+    """Open /media streams (reservations from /twiml may be claimed by another worker)."""
+    return sum(1 for c in registry.snapshot()["calls"] if c["state"] != "pending")
+
+
+def serve_worker(server, registry, metrics: Callable[[], dict], drain_seconds: float = DRAIN_SECONDS) -> None:
+    """
+    Serve until SIGTERM/SIGHUP (or SIGINT, which Ctrl+C sends to every worker too), then drain: stop accepting (the other workers keep the port),
+    wait for this worker's streams to end, and return. Writes metrics files meanwhile.
+    """
+    import gevent
+    from gevent.event import Event
+
+    draining = Event()
+    done = Event()
+
+    def drain():
+        logger.info("Worker pid %d draining (%d stream(s))", os.getpid(), _stream_count(registry))
+        server.close()
+        deadline = time.monotonic() + drain_seconds
+        while _stream_count(registry) and time.monotonic() < deadline:
+            gevent.sleep(1)
+        server.stop(timeout=5)
+        done.set()
+
+    def on_signal():
+        if not draining.is_set():
+            draining.set()
+            gevent.spawn(drain)
+
+    def publish():
+        while not done.is_set():
+            try:
+                write_metrics({**metrics(), "draining": draining.is_set()})
+            except Exception as e:
+                logger.warning("Could not write metrics: %s", e)
+            done.wait(METRICS_INTERVAL)
+
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        gevent.signal_handler(signum, on_signal)
+    server.start()
+    publisher = gevent.spawn(publish)
+    done.wait()
+    publisher.join(timeout=METRICS_INTERVAL)
+    _remove_metrics(os.getpid())
+
+
+def process_metrics(registry, reply_cache: Optional[dict] = None) -> dict:
+    """This process's counters, in the shape aggregate_metrics sums."""
+    snap = registry.snapshot()
+    body = {
+        "pid": os.getpid(),
+        "worker": os.environ.get(WORKER_ENV),
+        "updated_at": time.time(),
+        "active": snap["active"],
+        "streams": sum(1 for c in snap["calls"] if c["state"] != "pending"),
+        "states": dict(Counter(c["state"] for c in snap["calls"])),
+        "opened": snap["opened"],
+        "closed": snap["closed"],
+        "refused": snap["refused"],
+    }
+    if reply_cache is not None:
+        body["reply_cache"] = {k: reply_cache[k] for k in ("entries", "hits", "misses")}
+    return body
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def live_snapshots(directory: str = METRICS_DIR) -> list[dict]:
+    """Metrics files of running workers (those of dead or silent workers are ignored)."""
+    cutoff = time.time() - 5 * METRICS_INTERVAL
+    snapshots = []
+    try:
+        names = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return []
+    for name in names:
+        if not (name.startswith("worker_") and name.endswith(".json")):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue  # being replaced or removed right now
+        if snap.get("updated_at", 0) >= cutoff and _alive(snap.get("pid", 0)):
+            snapshots.append(snap)
+    return snapshots
+
+
+def summarize(snapshots: list[dict]) -> dict:
+    """Sum process_metrics snapshots into the /metrics body."""
+    total = {key: sum(s.get(key, 0) for s in snapshots) for key in _SUMMED}
+    states: Counter = Counter()
+    cache: Counter = Counter()
+    for s in snapshots:
+        states.update(s.get("states") or {})
+        cache.update(s.get("reply_cache") or {})
+    body = {"workers": len(snapshots), **total, "states": dict(states)}
+    if cache:
+        lookups = cache["hits"] + cache["misses"]
+        body["reply_cache"] = {**cache, "hit_rate": round(cache["hits"] / lookups, 3) if lookups else None}
+    body["per_worker"] = [
+        {k: s.get(k) for k in ("worker", "pid", "active", "streams", "opened", "draining")} for s in snapshots
+    ]
+    return body
@@ -0,0 +1,235 @@
+"""
+On-demand per-call profiling of the turn pipeline.
+Off by default. Turn on for specific calls or a sample of calls with
+    VOICE_BOT_PROFILE="MZaaa,MZbbb"   (streamSids)
+    VOICE_BOT_PROFILE="sample:0.05"   (5% of calls)
+    VOICE_BOT_PROFILE="all"
+or at runtime via the /admin/profile endpoint (see update_settings).
+
+A profiled call records wall time in named spans (process_and_reply, stt.*, llm.*, tts.*,
+send_frames, save_transcript), plus, under gevent, the time its greenlet was switched out
+while inside a span ("[switched out]": waiting on sockets, the codec pool, or other calls).
+When the call ends its collapsed stacks are written to PROFILES_DIR/<streamSid>.collapsed,
+one "frame;frame;frame microseconds" line per stack, ready for flamegraph.pl or speedscope.
+When no call is profiled, span() is a context-variable lookup returning a shared no-op, and
+no greenlet tracer is installed.
+"""
+import contextlib
+import contextvars
+import logging
+import math
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Optional
+
+from config import PROFILE_SPEC, PROFILES_DIR
+
+logger = logging.getLogger(__name__)
+
+SWITCHED_OUT = "[switched out]"
+
+_current: contextvars.ContextVar[Optional["CallProfiler"]] = contextvars.ContextVar("call_profiler", default=None)
+_NULL_SPAN = contextlib.nullcontext()
+
+_lock = threading.Lock()
+_stream_sids: set[str] = set()
+_sample = 0.0
+
+
+def update_settings(stream_sids=None, sample: float = None, off: bool = False) -> dict:
+    """Change which calls get profiled (applies to calls that start afterwards).
+    Raises ValueError (nothing changed) if stream_sids isn't a list of strings or sample isn't a number."""
+    global _sample
+    if stream_sids is not None:
+        if not isinstance(stream_sids, list) or not all(isinstance(s, str) for s in stream_sids):
+            raise ValueError("stream_sids must be a list of strings")
+    if sample is not None:
+        if isinstance(sample, bool):
+            raise ValueError("sample must be a number between 0 and 1")
+        try:
+            sample = float(sample)
+        except (TypeError, ValueError):
+            raise ValueError("sample must be a number between 0 and 1") from None
+        if not math.isfinite(sample):
+            raise ValueError("sample must be a number between 0 and 1")
+    with _lock:
+        if off:
+            _stream_sids.clear()
+            _sample = 0.0
+        if stream_sids is not None:
+            _stream_sids.update(s for s in stream_sids if s)
+        if sample is not None:
+            _sample = max(0.0, min(1.0, sample))
+    return settings()
+
+
+def settings() -> dict:
+    with _lock:
+        return {"stream_sids": sorted(_stream_sids), "sample": _sample, "profiles_dir": PROFILES_DIR}
+
+
+def _parse_spec(spec: str) -> None:
+    spec = spec.strip()
+    if not spec:
+        return
+    if spec == "all":
+        update_settings(sample=1.0)
+    elif spec.startswith("sample:"):
+        update_settings(sample=float(spec.split(":", 1)[1]))
+    else:
+        update_settings(stream_sids=[s.strip() for s in spec.split(",")])
+
+
+class CallProfiler:
+    """Collapsed-stack accumulator for one call (used from that call's greenlet/task only)."""
+
+    __slots__ = ("stream_sid", "_stack", "_totals", "_switched_at", "__weakref__")
+
+    def __init__(self, stream_sid: str):
+        self.stream_sid = stream_sid
+        self._stack: list[list] = []  # [name, start, child_seconds]
+        self._totals: dict[str, float] = {}  # "a;b;c" -> self seconds
+        self._switched_at: Optional[float] = None
+
+    def _path(self) -> str:
+        return ";".join(entry[0] for entry in self._stack)
+
+    def push(self, name: str) -> None:
+        self._stack.append([name, time.perf_counter(), 0.0])
+
+    def pop(self) -> None:
+        name, start, child = self._stack.pop()
+        total = time.perf_counter() - start
+        key = self._path() + ";" + name if self._stack else name
+        self._totals[key] = self._totals.get(key, 0.0) + max(0.0, total - child)
+        if self._stack:
+            self._stack[-1][2] += total
+
+    def switched_out(self) -> None:
+        self._switched_at = time.perf_counter()
+
+    def switched_in(self) -> None:
+        if self._switched_at is None:
+            return
+        waited = time.perf_counter() - self._switched_at
+        self._switched_at = None
+        if not self._stack:
+            return  # outside any span (e.g. waiting for the next frame): not turn time
+        key = self._path() + ";" + SWITCHED_OUT
+        self._totals[key] = self._totals.get(key, 0.0) + waited
+        self._stack[-1][2] += waited
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {int(seconds * 1e6)}" for stack, seconds in sorted(self._totals.items())) + "\n"
+
+    def dump(self, directory: str = PROFILES_DIR) -> Optional[str]:
+        if not self._totals:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.stream_sid}.collapsed")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.collapsed())
+        logger.info("Wrote call profile %s", path)
+        return path
+
+
+class _Span:
+    __slots__ = ("profiler", "name")
+
+    def __init__(self, profiler: CallProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.profiler.push(self.name)
+
+    def __exit__(self, *exc):
+        self.profiler.pop()
+        return False
+
+
+def span(name: str):
+    """Context manager timing name inside the current call's profile (no-op if not profiled)."""
+    profiler = _current.get()
+    if profiler is None:
+        return _NULL_SPAN
+    return _Span(profiler, name)
+
+
+# --- greenlet switch accounting (installed only while a profiled call is running) ---
+
+_by_greenlet: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_previous_tracer = None
+_tracer_installed = False
+
+
+def _tracer(event, args):
+    if event in ("switch", "throw"):
+        origin, target = args
+        profiler = _by_greenlet.get(origin)
+        if profiler is not None:
+            profiler.switched_out()
+        profiler = _by_greenlet.get(target)
+        if profiler is not None:
+            profiler.switched_in()
+    if _previous_tracer is not None:
+        _previous_tracer(event, args)
+
+
+def _track_greenlet(profiler: CallProfiler) -> None:
+    global _previous_tracer, _tracer_installed
+    from cooperative import gevent_active
+
+    if not gevent_active():
+        return
+    import greenlet
+
+    with _lock:
+        _by_greenlet[greenlet.getcurrent()] = profiler
+        if not _tracer_installed:
+            _previous_tracer = greenlet.settrace(_tracer)
+            _tracer_installed = True
+
+
+def _untrack_greenlet() -> None:
+    global _previous_tracer, _tracer_installed
+    if not _tracer_installed:
+        return
+    import greenlet
+
+    with _lock:
+        _by_greenlet.pop(greenlet.getcurrent(), None)
+        if not _by_greenlet and _tracer_installed:
+            greenlet.settrace(_previous_tracer)
+            _previous_tracer = None
+            _tracer_installed = False
+
+
+def start_call(stream_sid: Optional[str]) -> Optional[CallProfiler]:
+    """Begin profiling this call (in the current greenlet/task) if settings select it."""
+    if not stream_sid or not (_stream_sids or _sample):
+        return None
+    with _lock:
+        selected = stream_sid in _stream_sids or (_sample > 0 and random.random() < _sample)
+    if not selected:
+        return None
+    profiler = CallProfiler(stream_sid)
+    _current.set(profiler)
+    _track_greenlet(profiler)
+    logger.info("Profiling call %s", stream_sid)
+    return profiler
+
+
+def finish_call(profiler: Optional[CallProfiler]) -> Optional[CallProfiler]:
+    """Stop profiling in the current greenlet/task; call profiler.dump() (off-loop) afterwards."""
+    if profiler is None:
+        return None
+    _current.set(None)
+    _untrack_greenlet()
+    return profiler
+
+
+_parse_spec(PROFILE_SPEC)
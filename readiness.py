@@ -0,0 +1,103 @@
+"""
+Startup readiness for the media servers. warm_up() does the work the first turn would
+otherwise pay for: output directories, codec lookup tables, the OpenAI clients, a warm
+keep-alive connection for each, and the filler clip library. /health reports 503 until it
+has finished.
+"""
+import logging
+import time
+
+from config import OPENAI_API_KEY, ensure_dirs
+
+logger = logging.getLogger(__name__)
+
+COLD = "cold"
+WARMING = "warming"
+READY = "ready"
+
+state = COLD
+timings_ms: dict[str, float] = {}
+
+
+def is_ready() -> bool:
+    return state == READY
+
+
+def health() -> tuple[dict, int]:
+    """Body and status code for /health."""
+    if state == READY:
+        return {"status": "ok", "ready": True, "warmup_ms": timings_ms}, 200
+    return {"status": state, "ready": False}, 503
+
+
+def _step(name: str, fn) -> None:
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # Not fatal: the first turn just pays for this step instead.
+        logger.warning("Warm-up step %s failed: %s", name, e)
+    timings_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def _local_steps(connect: bool) -> None:
+    import audio_utils
+    import fillers
+    import patient_bot
+    import stt_tts
+
+    _step("dirs", ensure_dirs)
+    _step("codec_tables", audio_utils.warm_tables)
+    _step("stt_tts_client", stt_tts._client_or_default)
+    _step("patient_client", patient_bot._client_or_default)
+    # Clips missing on disk are rendered with TTS only when we may use the network.
+    _step("filler_clips", lambda: fillers.load_library(render_missing=connect))
+
+
+def warm_up(connect: bool = True) -> None:
+    """Warm the gevent server (sync clients). connect=False skips the network round trips."""
+    global state
+    state = WARMING
+    t0 = time.perf_counter()
+    _local_steps(connect)
+    if connect and OPENAI_API_KEY:
+        import patient_bot
+        import stt_tts
+        from openai_clients import open_connection
+
+        _step("stt_tts_connect", lambda: open_connection(stt_tts._client_or_default()))
+        _step("patient_connect", lambda: open_connection(patient_bot._client_or_default()))
+    timings_ms["total"] = round((time.perf_counter() - t0) * 1000, 1)
+    state = READY
+    logger.info("Ready (warm-up %s)", timings_ms)
+
+
+async def warm_up_async(connect: bool = True) -> None:
+    """Warm the asyncio server (AsyncOpenAI clients)."""
+    global state
+    import asyncio
+
+    state = WARMING
+    t0 = time.perf_counter()
+    await asyncio.to_thread(_local_steps, connect)
+    import patient_bot
+    import stt_tts
+
+    _step("stt_tts_async_client", stt_tts._async_client_or_default)
+    _step("patient_async_client", patient_bot._async_client_or_default)
+    if connect and OPENAI_API_KEY:
+        from openai_clients import open_connection_async
+
+        for name, client in (
+            ("stt_tts_connect", stt_tts._async_client_or_default()),
+            ("patient_connect", patient_bot._async_client_or_default()),
+        ):
+            t1 = time.perf_counter()
+            try:
+                await open_connection_async(client)
+            except Exception as e:
+                logger.warning("Warm-up step %s failed: %s", name, e)
+            timings_ms[name] = round((time.perf_counter() - t1) * 1000, 1)
+    timings_ms["total"] = round((time.perf_counter() - t0) * 1000, 1)
+    state = READY
+    logger.info("Ready (warm-up %s)", timings_ms)
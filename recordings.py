@@ -0,0 +1,53 @@
+"""
+Inbound-track recordings: the agent's side of each call as raw 8 kHz mulaw, written to
+RECORDINGS_DIR/call_<streamSid>_<scenario_id>.ulaw when VOICE_BOT_RECORD_INBOUND=1.
+The transcript's "recording" field names the file. replay_calls.py replays these.
+"""
+import os
+from typing import Iterator, Optional
+
+from config import RECORDINGS_DIR
+
+FRAME_BYTES = 160  # 20 ms of 8 kHz mulaw, as Twilio sends it
+# Write in ~10 s pieces so a call's recording never sits in memory whole
+FLUSH_BYTES = 8000 * 10
+
+
+def recording_path(stream_sid: str, scenario_id: str) -> str:
+    return os.path.join(RECORDINGS_DIR, f"call_{stream_sid}_{scenario_id}.ulaw")
+
+
+def append_bytes(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+class InboundRecorder:
+    """Collects inbound frames; take() hands back pieces for the caller to append off-loop."""
+
+    __slots__ = ("path", "_pending")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._pending = bytearray()
+
+    def add(self, chunk: bytes) -> None:
+        self._pending.extend(chunk)
+
+    def take(self, force: bool = False) -> Optional[bytes]:
+        if not self._pending or (len(self._pending) < FLUSH_BYTES and not force):
+            return None
+        data = bytes(self._pending)
+        self._pending.clear()
+        return data
+
+
+def read_frames(path: str, frame_bytes: int = FRAME_BYTES) -> Iterator[bytes]:
+    """Yield a recording back as Twilio-sized frames."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(frame_bytes)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,220 @@
+"""
+Replay recorded calls through the turn pipeline offline, faster than real time: no Twilio,
+no socket, no pacing. Checks a patient prompt or pipeline change against a corpus of calls.
+
+Inputs (files or directories; default: recordings/*.ulaw):
+  *.ulaw  inbound-track recordings (VOICE_BOT_RECORD_INBOUND=1). The frames go through the same
+          endpointing as the live servers (CallSession.add_inbound), then STT -> LLM -> TTS.
+  *.json  saved transcripts, text only: the agent's turns are kept and the patient's replies
+          are regenerated (LLM -> TTS). In a directory, call_live_* (still being written) and
+          .corrected.json files (re-transcriptions of a call already there) are skipped.
+Output: transcripts/replay/replay_<name>.json per call, plus transcripts/replay/replay_report.json
+with per-stage timings (stt_ms, llm_ms, tts_ms).
+
+Usage: python replay_calls.py [paths...] [--workers 4] [--no-tts] [--scenario ID]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+from config import RECORDINGS_DIR, SAMPLE_RATE_TWILIO, TRANSCRIPTS_DIR
+from transcript_store import is_corrected
+
+REPLAY_DIR = os.path.join(TRANSCRIPTS_DIR, "replay")
+STAGES = ("stt_ms", "llm_ms", "tts_ms")
+
+
+def scenario_from_recording(path: str) -> Optional[str]:
+    """call_<streamSid>_<scenario_id>.ulaw -> scenario_id (streamSids have no underscores)."""
+    stem = Path(path).stem
+    if not stem.startswith("call_") or "_" not in stem[len("call_") :]:
+        return None
+    return stem[len("call_") :].split("_", 1)[1]
+
+
+def _opening(scenario_id: str) -> list[dict]:
+    from scenarios import get_scenario
+
+    scenario = get_scenario(scenario_id)
+    if scenario and scenario.first_utterance:
+        return [{"role": "patient", "text": scenario.first_utterance}]
+    return []
+
+
+def _agent_turn(scenario_id: str, conversation: list[dict], utterance, synthesize: bool) -> dict:
+    """One live-style turn on an endpointed utterance; returns its stage timings."""
+    from turn_pipeline import agent_turn, reply_to_agent, transcribe_agent
+
+    timings = {"audio_ms": round(len(utterance.audio) * 1000 / SAMPLE_RATE_TWILIO)}
+    text = transcribe_agent(utterance.audio, timings)
+    if text and text.strip():
+        conversation.append(agent_turn(text, utterance, {"stt_ms": timings["stt_ms"]}))
+        reply_to_agent(scenario_id, conversation, text, timings, synthesize)
+    return timings
+
+
+def replay_recording(path: str, scenario_id: str, synthesize: bool) -> tuple[list[dict], list[dict], float]:
+    """Feed a .ulaw recording frame by frame through CallSession endpointing."""
+    from call_sessions import CallSession
+    from recordings import read_frames
+
+    session = CallSession(scenario_id=scenario_id)
+    session.stream_sid = "replay-" + Path(path).stem
+    session.conversation.extend(_opening(scenario_id))
+    turns = []
+    audio_bytes = 0
+    for i, frame in enumerate(read_frames(path)):
+        audio_bytes += len(frame)
+        utterance = session.add_inbound(frame, i * 20)
+        if utterance is not None:
+            turns.append(_agent_turn(scenario_id, session.conversation, utterance, synthesize))
+    remaining = session.take_remaining()
+    if remaining is not None:
+        turns.append(_agent_turn(scenario_id, session.conversation, remaining, synthesize))
+    return session.conversation, turns, audio_bytes / SAMPLE_RATE_TWILIO
+
+
+def replay_transcript(data: dict, scenario_id: str, synthesize: bool) -> tuple[list[dict], list[dict], float]:
+    """Keep the agent's turns from a saved transcript and regenerate every patient reply."""
+    from turn_pipeline import reply_to_agent
+
+    source = data.get("transcript") or data.get("conversation") or []
+    conversation = []
+    # Patient lines before the agent first speaks (the scenario's opening) are kept as-is.
+    for turn in source:
+        if turn.get("role") == "agent":
+            break
+        conversation.append(turn)
+    turns = []
+    for turn in source:
+        text = (turn.get("text") or "").strip()
+        if turn.get("role") != "agent" or not text:
+            continue
+        conversation.append({"role": "agent", "text": text})
+        timings: dict = {}
+        reply_to_agent(scenario_id, conversation, text, timings, synthesize)
+        turns.append(timings)
+    return conversation, turns, 0.0
+
+
+def replay_one(path: str, scenario_override: str = "", synthesize: bool = True) -> dict:
+    """Replay one input file and write its transcript; runs in a worker process."""
+    from transcript_store import transcript_payload, write_json
+
+    t0 = time.perf_counter()
+    if path.endswith(".ulaw"):
+        scenario_id = scenario_override or scenario_from_recording(path) or "schedule_new"
+        conversation, turns, audio_s = replay_recording(path, scenario_id, synthesize)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        scenario_id = scenario_override or data.get("scenario_id") or "schedule_new"
+        conversation, turns, audio_s = replay_transcript(data, scenario_id, synthesize)
+    wall_s = time.perf_counter() - t0
+
+    out_path = os.path.join(REPLAY_DIR, f"replay_{Path(path).stem}.json")
+    payload = transcript_payload(conversation, scenario_id)
+    payload["replay"] = {"source": os.path.basename(path), "turns": turns}
+    write_json(out_path, payload)
+    return {
+        "source": path,
+        "output": out_path,
+        "scenario_id": scenario_id,
+        "turns": len(turns),
+        "audio_s": round(audio_s, 1),
+        "wall_s": round(wall_s, 2),
+        "timings": turns,
+    }
+
+
+def _stage_summary(results: list[dict]) -> dict:
+    summary = {}
+    for stage in STAGES:
+        values = sorted(t[stage] for r in results for t in r["timings"] if stage in t)
+        if not values:
+            continue
+        summary[stage] = {
+            "count": len(values),
+            "mean": round(sum(values) / len(values), 1),
+            "p50": values[len(values) // 2],
+            "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+            "max": values[-1],
+        }
+    return summary
+
+
+def _replayable(f: Path) -> bool:
+    if f.suffix not in (".ulaw", ".json"):
+        return False
+    return not (f.name.startswith("call_live_") or is_corrected(f.name))
+
+
+def collect_inputs(paths: list[str]) -> list[str]:
+    """Files to replay; named files are taken as given, directories are filtered."""
+    if not paths:
+        paths = [RECORDINGS_DIR]
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(str(f) for f in sorted(Path(p).iterdir()) if _replayable(f))
+        elif os.path.isfile(p):
+            out.append(p)
+        else:
+            print("Not found:", p)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay recorded calls or transcripts through the turn pipeline")
+    ap.add_argument("paths", nargs="*", help=f"Recordings/transcripts or directories (default: {RECORDINGS_DIR})")
+    ap.add_argument("--workers", type=int, default=4, help="Parallel replay processes")
+    ap.add_argument("--no-tts", action="store_true", help="Skip speech synthesis of the patient's replies")
+    ap.add_argument("--scenario", default="", help="Scenario id for every input (default: from file)")
+    args = ap.parse_args()
+
+    inputs = collect_inputs(args.paths)
+    if not inputs:
+        print("Nothing to replay.")
+        sys.exit(1)
+    print(f"Replaying {len(inputs)} call(s) with {args.workers} worker(s)...")
+    t0 = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(replay_one, p, args.scenario, not args.no_tts): p for p in inputs}
+        for fut in as_completed(futures):
+            try:
+                r = fut.result()
+            except Exception as e:
+                print("Failed", futures[fut], e)
+                continue
+            results.append(r)
+            print(f"  {Path(r['source']).name}: {r['turns']} turn(s) in {r['wall_s']}s -> {r['output']}")
+    wall_s = time.perf_counter() - t0
+
+    audio_s = sum(r["audio_s"] for r in results)
+    report = {
+        "calls": len(results),
+        "failed": len(inputs) - len(results),
+        "wall_s": round(wall_s, 2),
+        "audio_s": round(audio_s, 1),
+        "stages": _stage_summary(results),
+        "results": sorted(results, key=lambda r: r["source"]),
+    }
+    report_path = os.path.join(REPLAY_DIR, "replay_report.json")
+    os.makedirs(REPLAY_DIR, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    for stage, s in report["stages"].items():
+        print(f"  {stage:<7} n={s['count']:<4} mean={s['mean']:>8} p50={s['p50']:>8} p95={s['p95']:>8}")
+    if audio_s:
+        print(f"Replayed {audio_s:.0f}s of call audio in {wall_s:.1f}s ({audio_s / wall_s:.1f}x real time)")
+    print("Wrote", report_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Opt-in patient reply cache for load and soak tests, where the office agent says nearly the
+same lines on every call. Off by default; never turn it on for evaluation runs, since cached
+replies are not fresh model output.
+  VOICE_BOT_REPLY_CACHE=5000            (servers: cache up to 5000 agent lines)
+  python simulate_calls.py --reply-cache 5000
+
+Key: scenario id + the agent's line, normalized (case, punctuation, leading "okay"/"um"...)
++ a short fingerprint of the context (the patient's previous line), so "Anything else?" after
+a booking doesn't reuse the reply to "Anything else?" at the start of the call.
+Each key collects `variants` model replies (repeats included) before it starts answering from
+the cache, picking one at random so conversations stay varied and a reply the model gives more
+often comes back more often. Least recently used keys are
+evicted past max_entries.
+"""
+import hashlib
+import random
+import re
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from config import REPLY_CACHE_SIZE
+
+_WORDS = re.compile(r"[a-z0-9']+")
+_LEADING_FILLER = {"okay", "ok", "alright", "um", "uh", "thanks"}
+
+
+def normalize(text: str) -> str:
+    words = _WORDS.findall(text.lower().replace("’", "'"))
+    i = 0
+    while i < len(words) - 1 and words[i] in _LEADING_FILLER:
+        i += 1
+    return " ".join(words[i:])
+
+
+def _fingerprint(conversation: list[dict]) -> str:
+    previous = next((t.get("text") or "" for t in reversed(conversation) if t.get("role") == "patient"), "")
+    return hashlib.blake2b(normalize(previous).encode(), digest_size=6).hexdigest()
+
+
+class ReplyCache:
+    def __init__(self, max_entries: int = 5000, variants: int = 3):
+        self.max_entries = max_entries
+        self.variants = variants
+        self._entries: "OrderedDict[tuple, list[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(scenario_id: str, conversation: list[dict], agent_text: str) -> tuple:
+        return (scenario_id, normalize(agent_text), _fingerprint(conversation))
+
+    def get(self, key: tuple) -> Optional[str]:
+        """A cached reply once the key has `variants` answers; None means ask the model."""
+        with self._lock:
+            replies = self._entries.get(key)
+            if replies is None or len(replies) < self.variants:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return random.choice(replies)
+
+    def put(self, key: tuple, reply: str) -> None:
+        with self._lock:
+            replies = self._entries.get(key)
+            if replies is None:
+                replies = self._entries[key] = []
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            if len(replies) < self.variants:
+                replies.append(reply)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+_cache: Optional[ReplyCache] = None
+
+
+def enable(max_entries: int = 5000, variants: int = 3) -> ReplyCache:
+    global _cache
+    _cache = ReplyCache(max_entries, variants)
+    return _cache
+
+
+def disable() -> None:
+    global _cache
+    _cache = None
+
+
+def current() -> Optional[ReplyCache]:
+    """The active cache, or None when caching is off (the default)."""
+    return _cache
+
+
+def stats() -> Optional[dict]:
+    return _cache.stats() if _cache is not None else None
+
+
+if REPLY_CACHE_SIZE > 0:
+    enable(REPLY_CACHE_SIZE)
@@ -0,0 +1,197 @@
+"""
+Post-call re-transcription: the live agent turns come from ~2 s Whisper chunks that split
+words. After a recorded call ends, its whole inbound track (recordings/*.ulaw) is transcribed
+in one pass, the timed segments are aligned to the call's turns, and the result is written as
+<transcript>.corrected.json next to the live transcript. analyze_bugs.py and latency_report.py
+prefer the corrected file.
+
+Jobs run on their own small pool of native threads (VOICE_BOT_RETRANSCRIBE_WORKERS), even under
+gevent, with their own OpenAI client, apart from the live turn pipeline. With VOICE_BOT_RETRANSCRIBE=1 (and VOICE_BOT_RECORD_INBOUND=1) the servers queue each
+call when it ends. For a backlog:
+  python retranscribe.py [transcripts...] [--workers 4] [--force]
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Optional
+
+from config import RECORDINGS_DIR, RETRANSCRIBE_MODEL, RETRANSCRIBE_WORKERS, TRANSCRIPTS_DIR
+from cooperative import gevent_active
+from transcript_store import corrected_path, is_corrected, write_json
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _own_client():
+    """Client for re-transcription only: its uploads and retry back-off never hold up live STT."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai_clients import make_client
+
+            _client = make_client()
+    return _client
+
+
+def align(turns: list[dict], segments: list[dict]) -> list[dict]:
+    """
+    Rebuild the agent's side from segments, keeping the patient turns. A segment goes to the
+    stretch between two played patient turns that holds its midpoint, and each stretch's
+    segments become one agent turn; the live agent turns (chopped 2 s chunks) are dropped.
+    Patient turns that never played (no start_ms) follow the agent speech they answered.
+    Without any timestamps nothing can be aligned and the turns come back unchanged.
+    """
+    if not any(t.get("role") == "patient" and t.get("start_ms") is not None for t in turns):
+        return turns
+    # Each block is the unplayed patient turns since the last played one, then that played turn.
+    leading: list[dict] = []
+    blocks: list[list[dict]] = []
+    pending: list[dict] = []
+    seen_agent = False
+    for t in turns:
+        if t.get("role") != "patient":
+            seen_agent = True
+        elif t.get("start_ms") is not None:
+            blocks.append(pending + [t])
+            pending = []
+        elif seen_agent:
+            pending.append(t)
+        else:
+            leading.append(t)
+    blocks.sort(key=lambda b: b[-1]["start_ms"])
+
+    out = list(leading)
+    seg_i = 0
+    # The trailing block (unplayed replies after the last played turn) takes the remaining segments.
+    for block, boundary in [(b, b[-1]["start_ms"]) for b in blocks] + [(pending, float("inf"))]:
+        group = []
+        while seg_i < len(segments) and (segments[seg_i]["start_ms"] + segments[seg_i]["end_ms"]) / 2 < boundary:
+            group.append(segments[seg_i])
+            seg_i += 1
+        if group:
+            out.append(
+                {
+                    "role": "agent",
+                    "text": " ".join(s["text"] for s in group),
+                    "start_ms": group[0]["start_ms"],
+                    "end_ms": group[-1]["end_ms"],
+                }
+            )
+        out.extend(block)
+    return out
+
+
+def retranscribe_file(transcript_path: str, model: str = RETRANSCRIBE_MODEL, force: bool = False) -> Optional[str]:
+    """Write the corrected transcript for one call; returns its path (None if nothing to do)."""
+    from stt_tts import transcribe_segments
+
+    out_path = corrected_path(transcript_path)
+    if not force and os.path.isfile(out_path):
+        return None
+    with open(transcript_path, encoding="utf-8") as f:
+        data = json.load(f)
+    recording = data.get("recording")
+    if not recording:
+        return None
+    recording_path = os.path.join(RECORDINGS_DIR, recording)
+    with open(recording_path, "rb") as f:
+        audio = f.read()
+    segments = transcribe_segments(audio, model, client=_own_client())
+    turns = data.get("transcript") or []
+    corrected = dict(data)
+    corrected["transcript"] = align(turns, segments)
+    corrected["corrected"] = {
+        "source": os.path.basename(transcript_path),
+        "model": model,
+        "segments": len(segments),
+        "aligned": corrected["transcript"] is not turns,
+    }
+    write_json(out_path, corrected)
+    logger.info("Wrote corrected transcript %s (%d segments)", out_path, len(segments))
+    return out_path
+
+
+# --- background queue used by the servers ---
+
+_pool: Optional[ThreadPoolExecutor] = None  # gevent's native-thread executor under server.py
+_pool_lock = threading.Lock()
+
+
+def _run_job(transcript_path: str) -> Optional[str]:
+    try:
+        return retranscribe_file(transcript_path)
+    except Exception as e:
+        logger.warning("Re-transcription of %s failed: %s", transcript_path, e)
+        return None
+
+
+def _make_pool() -> ThreadPoolExecutor:
+    workers = max(1, RETRANSCRIBE_WORKERS)
+    if gevent_active():
+        # Patched threading would make ThreadPoolExecutor workers greenlets on the hub, and the
+        # JSON parsing and file reads would stall every live call; these are real OS threads.
+        from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+
+        return NativeThreadPoolExecutor(workers)
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="retranscribe")
+
+
+def enqueue(transcript_path: str) -> Future:
+    """Queue a finished call for re-transcription; returns immediately."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _make_pool()
+    return _pool.submit(_run_job, transcript_path)
+
+
+def pending_transcripts(directory: str = TRANSCRIPTS_DIR, force: bool = False) -> list[str]:
+    """Final transcripts without a corrected file yet (all of them with force)."""
+    out = []
+    for f in sorted(Path(directory).glob("call_*.json")):
+        name = str(f)
+        if f.name.startswith("call_live_") or is_corrected(name):
+            continue
+        if not force and os.path.isfile(corrected_path(name)):
+            continue
+        out.append(name)
+    return out
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser(description="Re-transcribe recorded calls in one pass and write .corrected.json files")
+    ap.add_argument("paths", nargs="*", help="Transcript files (default: every recorded call in transcripts/)")
+    ap.add_argument("--workers", type=int, default=RETRANSCRIBE_WORKERS)
+    ap.add_argument("--model", default=RETRANSCRIBE_MODEL)
+    ap.add_argument("--force", action="store_true", help="Redo calls that already have a corrected file")
+    args = ap.parse_args()
+
+    paths = args.paths or pending_transcripts(force=args.force)
+    done = skipped = failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = {pool.submit(retranscribe_file, p, args.model, args.force): p for p in paths}
+        for fut in as_completed(futures):
+            try:
+                out = fut.result()
+            except Exception as e:
+                failed += 1
+                print("Failed", futures[fut], e)
+                continue
+            if out:
+                done += 1
+                print("Wrote", out)
+            else:
+                skipped += 1
+    print(f"{done} corrected, {skipped} skipped (no recording or already done), {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,11 @@ Requires: pip install ngrok, and NGROK_AUTHTOKEN in .env (get free at https://ng
 Run: python run_with_ngrok.py
 Then set TWILIO_WEBHOOK_BASE_URL in .env to the printed URL (no trailing slash).
 """
+# Patch before the server (and openai/httpx) is imported so calls don't block each other.
+from gevent import monkey
+
+monkey.patch_all()
+
 import os
 import sys
 import threading
@@ -47,8 +52,10 @@ except Exception as e:
 
 # Start server AFTER ngrok so server sees current TWILIO_WEBHOOK_BASE_URL
 def run_server():
+    import readiness
     import server
 
+    threading.Thread(target=readiness.warm_up, daemon=True).start()
     port = int(os.environ.get("PORT", 5050))
     from gevent import pywsgi
     from geventwebsocket.handler import WebSocketHandler
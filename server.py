@@ -3,20 +3,59 @@ Flask server: TwiML webhook for outbound calls and WebSocket for bidirectional m
 Run with: python server.py
 Use ngrok to expose TWILIO_WEBHOOK_BASE_URL (e.g. https://xxx.ngrok.io).
 """
+if __name__ == "__main__":
+    import os
+
+    import prefork
+
+    if prefork.supervising():
+        # VOICE_BOT_WORKERS > 1: this process only supervises; each worker runs this file again.
+        import logging
+
+        logging.basicConfig(level=logging.INFO)
+        raise SystemExit(prefork.supervise(__file__, int(os.environ.get("PORT", 5050))))
+
+    # Patch before openai/httpx/ssl are imported: every call shares one gevent hub, so a
+    # blocking Whisper/LLM/TTS request would otherwise stall all other calls' media.
+    from gevent import monkey
+
+    monkey.patch_all()
+
 import base64
-import json
 import logging
 import os
 import time
+from typing import Callable, Optional
 
 from flask import Flask, request
 from flask_sockets import Sockets
 
+import prefork
+import profiling
+import readiness
+import response_cache
+import retranscribe
+import transcript_index
 from audio_utils import mulaw_chunks_to_base64
-from config import TWILIO_WEBHOOK_BASE_URL, TRANSCRIPTS_DIR
-from patient_bot import patient_response
+from call_sessions import MIN_FLUSH_BYTES, CallSession, CallState, Utterance, registry
+from config import (
+    ADMIN_TOKEN,
+    BUSY_MODE,
+    INDEX_TRANSCRIPTS,
+    RECORD_INBOUND,
+    RETRANSCRIBE,
+    TWILIO_WEBHOOK_BASE_URL,
+    TRANSCRIPTS_DIR,
+)
+from cooperative import run_file_io
+from fillers import FillerPlayer
+from profiling import span
+from recordings import InboundRecorder, append_bytes, recording_path
 from scenarios import get_scenario
-from stt_tts import transcribe_mulaw, text_to_mulaw
+from stt_tts import text_to_mulaw
+from transcript_store import transcript_payload, write_json
+from turn_pipeline import agent_turn, mark_played, reply_to_agent, transcribe_agent
+from twilio_media import build_busy_twiml, build_stream_twiml, mark_message, media_message, parse_message, stream_url_for
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -38,64 +77,54 @@ def not_found(e):
     return "Not found (voice bot app). Path: " + request.path, 404
 
 
-# Minimum buffer size before running STT (~1.5 sec at 8kHz mulaw = 12000 bytes)
-MIN_BUFFER_BYTES = 12000
-# Process every N inbound media messages (each ~320 bytes = 20ms) -> ~2 sec
-MEDIA_BATCH_SIZE = 100
-
-
 def process_and_reply(
     scenario_id: str,
     stream_sid: str,
     conversation: list[dict],
-    inbound_buffer: bytearray,
+    utterance: Utterance,
     ws_send_fn,
+    filler: Optional[FillerPlayer] = None,
+    clock: Optional[Callable[[], Optional[int]]] = None,
 ) -> None:
-    """Run STT on buffer, get patient reply, TTS, send to Twilio. Caller clears inbound_buffer."""
-    if len(inbound_buffer) < 800:
+    """Run STT on the utterance, get patient reply, TTS, send to Twilio.
+    With a FillerPlayer, a filler clip covers the wait if the reply is slow.
+    clock() gives the media-clock time used to stamp when the reply starts playing."""
+    if len(utterance.audio) < MIN_FLUSH_BYTES:
         return
-    mulaw = bytes(inbound_buffer)
-    text = transcribe_mulaw(mulaw)
+    timings: dict = {}
+    text = transcribe_agent(utterance.audio, timings)
     if not text or not text.strip():
         return
 
     # Append agent turn
-    conversation.append({"role": "agent", "text": text})
-    reply = patient_response(scenario_id, conversation, text)
-    conversation.append({"role": "patient", "text": reply})
-
-    if not reply.strip():
-        return
+    conversation.append(agent_turn(text, utterance, timings))
+    if filler is not None:
+        filler.arm(timings["stt_ms"], after_turn=len(conversation) - 1)
+    try:
+        reply_turn, mulaw_audio = reply_to_agent(scenario_id, conversation, text, timings)
+        if not mulaw_audio:
+            return
+    finally:
+        if filler is not None:
+            # Cancel, or let a clip already playing finish so the reply queues right after it.
+            with span("filler.wait"):
+                filler.finish()
 
-    mulaw_audio = text_to_mulaw(reply)
-    if not mulaw_audio:
-        return
+    mark_played(reply_turn, clock() if clock else None, mulaw_audio)
+    with span("send_frames"):
+        _send_audio(stream_sid, mulaw_audio, f"mark-{time.time()}", ws_send_fn)
 
-    chunks_b64 = mulaw_chunks_to_base64(mulaw_audio)
-    mark_name = f"mark-{time.time()}"
 
-    for payload in chunks_b64:
-        msg = {
-            "event": "media",
-            "streamSid": stream_sid,
-            "media": {"payload": payload},
-        }
+def _send_audio(stream_sid: str, mulaw_audio: bytes, mark_name: str, ws_send_fn) -> None:
+    for payload in mulaw_chunks_to_base64(mulaw_audio):
         try:
-            ws_send_fn(json.dumps(msg))
+            ws_send_fn(media_message(stream_sid, payload))
         except Exception as e:
             logger.warning("Send media failed: %s", e)
             return
 
     try:
-        ws_send_fn(
-            json.dumps(
-                {
-                    "event": "mark",
-                    "streamSid": stream_sid,
-                    "mark": {"name": mark_name},
-                }
-            )
-        )
+        ws_send_fn(mark_message(stream_sid, mark_name))
     except Exception as e:
         logger.warning("Send mark failed: %s", e)
 
@@ -119,28 +148,64 @@ def _fix_media_websocket_rule():
 _fix_media_websocket_rule()
 
 
-def _save_transcript(conversation: list, path: str, scenario_id: str, call_sid: str = None):
+def _save_transcript(
+    conversation: list, path: str, scenario_id: str, call_sid: str = None, fillers: list = None, recording: str = None
+):
     """Write transcript to a JSON file (used for live saves and final save)."""
     try:
-        payload = {"scenario_id": scenario_id, "transcript": conversation}
-        if call_sid:
-            payload["call_sid"] = call_sid
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2)
+        with span("save_transcript"):
+            payload = transcript_payload(conversation, scenario_id, call_sid, fillers, recording)
+            run_file_io(write_json, path, payload)
         logger.info("Saved transcript to %s", path)
     except Exception as e:
         logger.warning("Could not save transcript: %s", e)
 
 
+def _flush_recording(session: CallSession, force: bool = False) -> None:
+    """Append the recorder's pending inbound audio to its .ulaw file (every ~10 s, or all at call end)."""
+    data = session.recorder.take(force)
+    if data:
+        try:
+            run_file_io(append_bytes, session.recorder.path, data)
+        except Exception as e:
+            logger.warning("Could not write recording: %s", e)
+
+
+def _index_transcript(path: str) -> None:
+    """Add a final transcript to the query index (transcript_index.py)."""
+    try:
+        run_file_io(transcript_index.index_file, path)
+    except Exception as e:
+        logger.warning("Could not index transcript: %s", e)
+
+
+def _reply_turn(session: CallSession, utterance: Utterance, send) -> None:
+    """One STT -> LLM -> TTS turn, with the session showing REPLYING while it runs."""
+    session.transition(CallState.REPLYING)
+    try:
+        filler = FillerPlayer(session.stream_sid, send, session.fillers)
+        with span("process_and_reply"):
+            process_and_reply(
+                session.scenario_id,
+                session.stream_sid,
+                session.conversation,
+                utterance,
+                send,
+                filler,
+                session.stream_clock_ms,
+            )
+    finally:
+        session.transition(CallState.STREAMING)
+
+
 def media_stream_body(ws):
-    """WebSocket handler body (stream_sid, conversation, etc.)."""
-    stream_sid = None
-    scenario_id = "schedule_new"  # updated from start message customParameters
-    conversation = []
-    inbound_buffer = bytearray()
-    media_count = 0
-    first_utterance_sent = False
-    live_transcript_path = None  # save as we go so closing terminal doesn't lose transcript
+    """WebSocket handler body; per-call state lives in a CallSession visible at /calls."""
+    # Prefork workers don't reserve at /twiml, so the cap is enforced here instead.
+    session = registry.open_stream(enforce_cap=prefork.is_worker())
+    if session is None:
+        logger.warning("At capacity (%s calls); closing /media stream", registry.max_calls)
+        ws.close()
+        return
 
     def send(msg: str):
         try:
@@ -149,140 +214,139 @@ def media_stream_body(ws):
             logger.warning("ws.send failed: %s", e)
 
     def save_live():
-        if live_transcript_path and conversation:
-            _save_transcript(conversation, live_transcript_path, scenario_id)
+        # save as we go so closing terminal doesn't lose transcript
+        if session.live_transcript_path and session.conversation:
+            _save_transcript(
+                session.conversation, session.live_transcript_path, session.scenario_id, fillers=session.fillers
+            )
+
+    logger.info("WebSocket connected, session_id=%s", session.session_id)
+
+    try:
+        _media_loop(ws, session, send, save_live)
+    finally:
+        if session.recorder is not None:
+            _flush_recording(session, force=True)
+        registry.close(session)
+        profiler = profiling.finish_call(session.profiler)
+        if profiler is not None:
+            run_file_io(profiler.dump)
+    logger.info("WebSocket closed")
 
-    logger.info("WebSocket connected, scenario_id=%s", scenario_id)
 
+def _media_loop(ws, session: CallSession, send, save_live) -> None:
     while not ws.closed:
         message = ws.receive()
         if message is None:
             continue
 
-        try:
-            data = json.loads(message)
-        except json.JSONDecodeError:
+        event, data, frame = parse_message(message)
+        if event is None:
             continue
 
-        event = data.get("event")
-
         if event == "connected":
             logger.info("Stream connected")
 
         elif event == "start":
-            stream_sid = data.get("streamSid") or (data.get("start") or {}).get("streamSid")
-            custom = (data.get("start") or {}).get("customParameters") or {}
-            scenario_id = custom.get("scenario_id") or scenario_id
+            start = data.get("start") or {}
+            session.stream_sid = data.get("streamSid") or start.get("streamSid")
+            session.call_sid = start.get("callSid")
+            custom = start.get("customParameters") or {}
+            session.scenario_id = custom.get("scenario_id") or session.scenario_id
+            registry.claim(session, custom.get("session_id"))
+            session.transition(CallState.STREAMING)
+            session.mark_stream_start()
+            stream_sid, scenario_id = session.stream_sid, session.scenario_id
+            session.profiler = profiling.start_call(stream_sid)
             logger.info("Stream start streamSid=%s scenario_id=%s", stream_sid, scenario_id)
             if stream_sid:
-                live_transcript_path = os.path.join(
+                session.live_transcript_path = os.path.join(
                     TRANSCRIPTS_DIR,
                     f"call_live_{stream_sid}_{scenario_id}.json",
                 )
+                if RECORD_INBOUND:
+                    session.recorder = InboundRecorder(recording_path(stream_sid, scenario_id))
 
             # Optional: speak first (e.g. "Hi, I'd like to schedule an appointment")
             scenario = get_scenario(scenario_id)
-            if scenario and scenario.first_utterance and stream_sid and not first_utterance_sent:
-                first_utterance_sent = True
-                conversation.append({"role": "patient", "text": scenario.first_utterance})
+            if scenario and scenario.first_utterance and stream_sid and not session.first_utterance_sent:
+                session.first_utterance_sent = True
+                first_turn = {"role": "patient", "text": scenario.first_utterance}
+                session.conversation.append(first_turn)
                 save_live()
                 mulaw_audio = text_to_mulaw(scenario.first_utterance)
                 if mulaw_audio:
+                    mark_played(first_turn, session.stream_clock_ms(), mulaw_audio)
                     for payload in mulaw_chunks_to_base64(mulaw_audio):
-                        send(
-                            json.dumps(
-                                {
-                                    "event": "media",
-                                    "streamSid": stream_sid,
-                                    "media": {"payload": payload},
-                                }
-                            )
-                        )
-                    send(
-                        json.dumps(
-                            {
-                                "event": "mark",
-                                "streamSid": stream_sid,
-                                "mark": {"name": "first"},
-                            }
-                        )
-                    )
+                        send(media_message(stream_sid, payload))
+                    send(mark_message(stream_sid, "first"))
 
         elif event == "media":
-            track = (data.get("media") or {}).get("track", "inbound")
-            if track != "inbound":
+            if frame.track != "inbound" or not frame.payload:
                 continue
-            payload = (data.get("media") or {}).get("payload")
-            if payload:
-                try:
-                    inbound_buffer.extend(base64.b64decode(payload))
-                except Exception:
-                    pass
-                media_count += 1
-
-                if media_count >= MEDIA_BATCH_SIZE and stream_sid:
-                    media_count = 0
-                    if len(inbound_buffer) >= MIN_BUFFER_BYTES:
-                        buf_snapshot = bytearray(inbound_buffer)
-                        inbound_buffer.clear()
-                        process_and_reply(
-                            scenario_id,
-                            stream_sid,
-                            conversation,
-                            buf_snapshot,
-                            send,
-                        )
-                        save_live()
+            try:
+                chunk = base64.b64decode(frame.payload)
+            except Exception:
+                chunk = b""
+            utterance = session.add_inbound(chunk, frame.timestamp)
+            if session.recorder is not None:
+                _flush_recording(session)
+            if utterance is not None:
+                _reply_turn(session, utterance, send)
+                save_live()
 
         elif event == "stop":
             # Flush remaining buffer
-            if stream_sid and len(inbound_buffer) >= 800:
-                process_and_reply(
-                    scenario_id,
-                    stream_sid,
-                    conversation,
-                    inbound_buffer,
-                    send,
-                )
-            inbound_buffer.clear()
+            remaining = session.take_remaining()
+            if remaining is not None:
+                _reply_turn(session, remaining, send)
             save_live()
+            recording = None
+            if session.recorder is not None:
+                _flush_recording(session, force=True)
+                recording = os.path.basename(session.recorder.path)
 
             # Save final transcript (full conversation = both sides)
-            call_sid = (data.get("stop") or {}).get("callSid") or "unknown"
+            call_sid = (data.get("stop") or {}).get("callSid") or session.call_sid or "unknown"
+            session.call_sid = call_sid
             out_path = os.path.join(
                 TRANSCRIPTS_DIR,
-                f"call_{call_sid}_{scenario_id}_{int(time.time())}.json",
+                f"call_{call_sid}_{session.scenario_id}_{int(time.time())}.json",
+            )
+            _save_transcript(
+                session.conversation,
+                out_path,
+                session.scenario_id,
+                call_sid=call_sid,
+                fillers=session.fillers,
+                recording=recording,
             )
-            _save_transcript(conversation, out_path, scenario_id, call_sid=call_sid)
-            if live_transcript_path and os.path.isfile(live_transcript_path):
+            if INDEX_TRANSCRIPTS:
+                _index_transcript(out_path)
+            if RETRANSCRIBE and recording:
+                retranscribe.enqueue(out_path)
+            live_path = session.live_transcript_path
+            if live_path and os.path.isfile(live_path):
                 try:
-                    os.remove(live_transcript_path)
+                    os.remove(live_path)
                 except Exception as e:
                     logger.warning("Could not remove live transcript file: %s", e)
             break
 
-    logger.info("WebSocket closed")
-
 
 @app.route("/twiml", methods=["GET", "POST"], strict_slashes=False)
 def twiml():
     """Return TwiML that connects the call to our WebSocket stream (for outbound)."""
     logger.info("Serving TwiML for scenario_id=%s", request.args.get("scenario_id"))
     scenario_id = request.args.get("scenario_id", "schedule_new")
+    # Under prefork the /media stream may reach another worker, so only check for room here.
+    reserve = not prefork.is_worker()
+    reservation = registry.admit(scenario_id, reserve=reserve)
+    if reservation is None:
+        logger.warning("At capacity (%s calls); refusing scenario_id=%s", registry.max_calls, scenario_id)
+        return build_busy_twiml(BUSY_MODE), 200, {"Content-Type": "application/xml"}
     base = TWILIO_WEBHOOK_BASE_URL or request.host_url.rstrip("/")
-    if not base.startswith("http"):
-        base = f"https://{base}"
-    wss_url = base.replace("https://", "wss://").replace("http://", "ws://")
-    stream_url = f"{wss_url}/media"
-
-    twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-  <Connect>
-    <Stream url="{stream_url}">
-      <Parameter name="scenario_id" value="{scenario_id}" />
-    </Stream>
-  </Connect>
-</Response>"""
+    twiml = build_stream_twiml(stream_url_for(base), scenario_id, reservation.session_id if reserve else None)
     return twiml, 200, {"Content-Type": "application/xml"}
 
 
@@ -294,22 +358,73 @@ def index():
 
 @app.route("/health")
 def health():
-    return {"status": "ok"}, 200
+    """503 until readiness.warm_up() has built the clients, connections and codec tables."""
+    body, status = readiness.health()
+    if prefork.is_worker():
+        body.update(worker=os.environ[prefork.WORKER_ENV], pid=os.getpid())
+    return body, status
+
+
+@app.route("/admin/profile", methods=["GET", "POST"])
+def admin_profile():
+    """Show or change which calls are profiled. POST JSON: {"stream_sids": [...], "sample": 0.1, "off": true}."""
+    # No token configured means no admin access: the server is reachable through ngrok.
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return {"error": "forbidden"}, 403
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return {"error": "expected a JSON object"}, 400
+        try:
+            return profiling.update_settings(body.get("stream_sids"), body.get("sample"), bool(body.get("off"))), 200
+        except ValueError as e:
+            return {"error": str(e)}, 400
+    return profiling.settings(), 200
+
+
+@app.route("/calls")
+def calls():
+    """Live sessions: state, turn count and buffered inbound bytes per call (+ reply cache stats if on)."""
+    body = registry.snapshot()
+    if response_cache.current() is not None:
+        body["reply_cache"] = response_cache.stats()
+    return body, 200
+
+
+@app.route("/metrics")
+def metrics():
+    """Call counters summed over all prefork workers (just this process when not in prefork mode)."""
+    snapshots = prefork.live_snapshots() if prefork.is_worker() else [_process_metrics()]
+    return prefork.summarize(snapshots), 200
+
+
+def _process_metrics() -> dict:
+    return prefork.process_metrics(registry, response_cache.stats())
 
 
 if __name__ == "__main__":
     # Default 5050: port 5000 is often blocked or in use on Windows
     port = int(os.environ.get("PORT", 5050))
+    import threading
+
     from gevent import pywsgi
     from geventwebsocket.handler import WebSocketHandler
 
+    threading.Thread(target=readiness.warm_up, daemon=True).start()
+
     # Default: plain WSGI so /, /health, /twiml work. gevent-websocket's WebSocketHandler
     # returns 404 for normal HTTP on many setups, so we only use it when explicitly requested.
     use_websocket = os.environ.get("VOICE_BOT_WEBSOCKET", "").strip().lower() in ("1", "true", "yes")
+    # Prefork workers serve on the supervisor's socket (or their own SO_REUSEPORT one).
+    listener = prefork.worker_listener(port)
+    address = listener if listener is not None else ("", port)
     if use_websocket:
-        server = pywsgi.WSGIServer(("", port), app, handler_class=WebSocketHandler)
+        server = pywsgi.WSGIServer(address, app, handler_class=WebSocketHandler)
         logger.info("Server listening on port %s (WebSocket enabled for /media)", port)
     else:
-        server = pywsgi.WSGIServer(("", port), app)
+        server = pywsgi.WSGIServer(address, app)
         logger.info("Server listening on port %s (/, /health, /twiml OK; for voice set VOICE_BOT_WEBSOCKET=1)", port)
-    server.serve_forever()
+    if prefork.is_worker():
+        prefork.serve_worker(server, registry, _process_metrics)
+    else:
+        server.serve_forever()
@@ -0,0 +1,387 @@
+"""
+asyncio media server: same /twiml, /health and /media contract as server.py, built on
+aiohttp WebSockets and AsyncOpenAI instead of Flask + flask-sockets + gevent.
+Each call runs three tasks: a reader (Twilio frames -> inbound buffer), a turn worker
+(STT -> LLM -> TTS) and a playback sender, so an idle or slow socket costs only tasks.
+Run with: python server_async.py   (same PORT / TWILIO_WEBHOOK_BASE_URL settings as server.py)
+"""
+import asyncio
+import base64
+import logging
+import os
+import time
+
+from aiohttp import WSMsgType, web
+
+import fillers
+import prefork
+import profiling
+import readiness
+import response_cache
+import retranscribe
+import transcript_index
+from audio_utils import mulaw_chunks_to_base64
+from call_sessions import CallSession, CallState, registry
+from config import (
+    ADMIN_TOKEN,
+    BUSY_MODE,
+    FILLER_AFTER_MS,
+    INDEX_TRANSCRIPTS,
+    RECORD_INBOUND,
+    RETRANSCRIBE,
+    TWILIO_WEBHOOK_BASE_URL,
+    TRANSCRIPTS_DIR,
+)
+from cooperative import run_cpu_async
+from patient_bot import patient_response_async
+from profiling import span
+from recordings import InboundRecorder, append_bytes, recording_path
+from scenarios import get_scenario
+from stt_tts import text_to_mulaw_async, transcribe_mulaw_async
+from transcript_store import transcript_payload, write_json
+from turn_pipeline import agent_turn, mark_played
+from twilio_media import build_busy_twiml, build_stream_twiml, mark_message, media_message, parse_message, stream_url_for
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def _save_transcript(
+    conversation: list, path: str, scenario_id: str, call_sid: str = None, fillers: list = None, recording: str = None
+):
+    """Write transcript to a JSON file off the event loop."""
+    try:
+        payload = transcript_payload(list(conversation), scenario_id, call_sid, list(fillers or []), recording)
+        await asyncio.to_thread(write_json, path, payload)
+        logger.info("Saved transcript to %s", path)
+    except Exception as e:
+        logger.warning("Could not save transcript: %s", e)
+
+
+async def _flush_recording(session: CallSession, force: bool = False) -> None:
+    """Append the recorder's pending inbound audio to its .ulaw file off the event loop."""
+    data = session.recorder.take(force)
+    if data:
+        try:
+            await asyncio.to_thread(append_bytes, session.recorder.path, data)
+        except Exception as e:
+            logger.warning("Could not write recording: %s", e)
+
+
+async def _index_transcript(path: str) -> None:
+    """Add a final transcript to the query index (transcript_index.py)."""
+    try:
+        await asyncio.to_thread(transcript_index.index_file, path)
+    except Exception as e:
+        logger.warning("Could not index transcript: %s", e)
+
+
+class _Call:
+    """Queues shared by the reader, turn worker and playback sender; state lives in session."""
+
+    def __init__(self, session: CallSession):
+        self.session = session
+        self.turns = asyncio.Queue()  # Utterances to transcribe (str: text to speak); None = call ended
+        self.playback = asyncio.Queue()  # outbound JSON frames; None = no more audio
+
+    async def save_live(self):
+        session = self.session
+        if session.live_transcript_path and session.conversation:
+            await _save_transcript(
+                session.conversation, session.live_transcript_path, session.scenario_id, fillers=session.fillers
+            )
+
+    async def play(self, mulaw_audio: bytes, mark_name: str):
+        stream_sid = self.session.stream_sid
+        for payload in await run_cpu_async(mulaw_chunks_to_base64, mulaw_audio):
+            await self.playback.put(media_message(stream_sid, payload))
+        await self.playback.put(mark_message(stream_sid, mark_name))
+
+
+async def _reader(ws: web.WebSocketResponse, call: _Call) -> str:
+    """Read Twilio frames until stop/close; hand ~2 s inbound snapshots to the turn worker."""
+    session = call.session
+    async for msg in ws:
+        if msg.type != WSMsgType.TEXT:
+            if msg.type == WSMsgType.ERROR:
+                logger.warning("WebSocket error: %s", ws.exception())
+            continue
+        event, data, frame = parse_message(msg.data)
+        if event is None:
+            continue
+
+        if event == "connected":
+            logger.info("Stream connected")
+
+        elif event == "start":
+            start = data.get("start") or {}
+            session.stream_sid = data.get("streamSid") or start.get("streamSid")
+            session.call_sid = start.get("callSid")
+            custom = start.get("customParameters") or {}
+            session.scenario_id = custom.get("scenario_id") or session.scenario_id
+            registry.claim(session, custom.get("session_id"))
+            session.transition(CallState.STREAMING)
+            session.mark_stream_start()
+            logger.info("Stream start streamSid=%s scenario_id=%s", session.stream_sid, session.scenario_id)
+            if session.stream_sid:
+                session.live_transcript_path = os.path.join(
+                    TRANSCRIPTS_DIR,
+                    f"call_live_{session.stream_sid}_{session.scenario_id}.json",
+                )
+                if RECORD_INBOUND:
+                    session.recorder = InboundRecorder(recording_path(session.stream_sid, session.scenario_id))
+            scenario = get_scenario(session.scenario_id)
+            if scenario and scenario.first_utterance and session.stream_sid and not session.first_utterance_sent:
+                session.first_utterance_sent = True
+                # Queued as a text turn so it plays before any reply.
+                await call.turns.put(scenario.first_utterance)
+
+        elif event == "media":
+            if frame.track != "inbound" or not frame.payload:
+                continue
+            try:
+                chunk = base64.b64decode(frame.payload)
+            except Exception:
+                chunk = b""
+            utterance = session.add_inbound(chunk, frame.timestamp)
+            if session.recorder is not None:
+                await _flush_recording(session)
+            if utterance is not None:
+                await call.turns.put(utterance)
+
+        elif event == "stop":
+            remaining = session.take_remaining()
+            if remaining is not None:
+                await call.turns.put(remaining)
+            session.call_sid = (data.get("stop") or {}).get("callSid") or session.call_sid
+            break
+    await call.turns.put(None)
+
+
+async def _filler_after(call: _Call, delay_s: float, after_turn: int):
+    """Queue a filler clip if the reply isn't ready after delay_s (cancelled otherwise).
+    put_nowait never yields, so a clip is queued whole and the reply lands right after it."""
+    await asyncio.sleep(delay_s)
+    clip = fillers.pick()
+    if clip is None:
+        return
+    name, frames = clip
+    for payload in frames:
+        call.playback.put_nowait(media_message(call.session.stream_sid, payload))
+    call.session.fillers.append(fillers.filler_record(name, after_turn))
+
+
+def _ms_since(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+async def _turn_worker(call: _Call):
+    """STT -> patient LLM -> TTS for each snapshot, in order; replies go to the playback queue."""
+    session = call.session
+    profiling_checked = False
+    while True:
+        item = await call.turns.get()
+        if item is None:
+            break
+        if not profiling_checked:
+            # First item arrives after the start event, so the streamSid is known.
+            profiling_checked = True
+            session.profiler = profiling.start_call(session.stream_sid)
+        session.transition(CallState.REPLYING)
+        try:
+            with span("process_and_reply"):
+                if isinstance(item, str):
+                    first_turn = {"role": "patient", "text": item}
+                    session.conversation.append(first_turn)
+                    await call.save_live()
+                    mulaw_audio = await text_to_mulaw_async(item)
+                    if mulaw_audio:
+                        mark_played(first_turn, session.stream_clock_ms(), mulaw_audio)
+                        await call.play(mulaw_audio, "first")
+                    continue
+
+                t0 = time.perf_counter()
+                text = await transcribe_mulaw_async(item.audio)
+                timings = {"stt_ms": _ms_since(t0)}
+                if not text or not text.strip():
+                    continue
+                session.conversation.append(agent_turn(text, item, timings))
+                filler = None
+                if FILLER_AFTER_MS > 0:
+                    delay_s = max(0.0, (FILLER_AFTER_MS - timings["stt_ms"]) / 1000)
+                    filler = asyncio.create_task(_filler_after(call, delay_s, len(session.conversation) - 1))
+                try:
+                    t0 = time.perf_counter()
+                    reply = await patient_response_async(session.scenario_id, session.conversation, text)
+                    reply_turn = {"role": "patient", "text": reply, "llm_ms": _ms_since(t0)}
+                    session.conversation.append(reply_turn)
+                    await call.save_live()
+                    mulaw_audio = b""
+                    if reply.strip():
+                        t0 = time.perf_counter()
+                        mulaw_audio = await text_to_mulaw_async(reply)
+                        reply_turn["tts_ms"] = _ms_since(t0)
+                finally:
+                    if filler is not None:
+                        filler.cancel()
+                if mulaw_audio:
+                    mark_played(reply_turn, session.stream_clock_ms(), mulaw_audio)
+                    await call.play(mulaw_audio, f"mark-{time.time()}")
+        except Exception as e:
+            logger.warning("Turn failed: %s", e)
+        finally:
+            if session.state == CallState.REPLYING:
+                session.transition(CallState.STREAMING)
+    await call.playback.put(None)
+    profiler = profiling.finish_call(session.profiler)
+    if profiler is not None:
+        await asyncio.to_thread(profiler.dump)
+
+
+async def _playback_sender(ws: web.WebSocketResponse, call: _Call):
+    """Send queued frames in order; a slow socket only backs up this call's queue."""
+    while True:
+        frame = await call.playback.get()
+        if frame is None:
+            break
+        if ws.closed:
+            continue  # drain so the worker never blocks on a dead call
+        try:
+            await ws.send_str(frame)
+        except Exception as e:
+            logger.warning("ws.send failed: %s", e)
+
+
+async def media(request: web.Request) -> web.WebSocketResponse:
+    """WebSocket: receive Twilio media, run STT -> LLM -> TTS, send audio back."""
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    session = registry.open_stream()
+    call = _Call(session)
+    logger.info("WebSocket connected, session_id=%s", session.session_id)
+
+    worker = asyncio.create_task(_turn_worker(call))
+    sender = asyncio.create_task(_playback_sender(ws, call))
+    try:
+        await _reader(ws, call)
+        await worker
+        await sender
+
+        await call.save_live()
+        recording = None
+        if session.recorder is not None:
+            await _flush_recording(session, force=True)
+            recording = os.path.basename(session.recorder.path)
+        if session.stream_sid:
+            call_sid = session.call_sid or "unknown"
+            out_path = os.path.join(
+                TRANSCRIPTS_DIR,
+                f"call_{call_sid}_{session.scenario_id}_{int(time.time())}.json",
+            )
+            await _save_transcript(
+                session.conversation,
+                out_path,
+                session.scenario_id,
+                call_sid=call_sid,
+                fillers=session.fillers,
+                recording=recording,
+            )
+            if INDEX_TRANSCRIPTS:
+                await _index_transcript(out_path)
+            if RETRANSCRIBE and recording:
+                retranscribe.enqueue(out_path)
+            live_path = session.live_transcript_path
+            if live_path and os.path.isfile(live_path):
+                try:
+                    os.remove(live_path)
+                except Exception as e:
+                    logger.warning("Could not remove live transcript file: %s", e)
+    finally:
+        # Any exit (error, cancellation) stops this call's tasks so none outlive the session.
+        unfinished = [task for task in (worker, sender) if not task.done()]
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        registry.close(session)
+    logger.info("WebSocket closed")
+    return ws
+
+
+async def twiml(request: web.Request) -> web.Response:
+    """Return TwiML that connects the call to our WebSocket stream (for outbound)."""
+    scenario_id = request.query.get("scenario_id", "schedule_new")
+    logger.info("Serving TwiML for scenario_id=%s", scenario_id)
+    reservation = registry.admit(scenario_id)
+    if reservation is None:
+        logger.warning("At capacity (%s calls); refusing scenario_id=%s", registry.max_calls, scenario_id)
+        return web.Response(text=build_busy_twiml(BUSY_MODE), content_type="application/xml")
+    base = TWILIO_WEBHOOK_BASE_URL or f"{request.scheme}://{request.host}"
+    twiml = build_stream_twiml(stream_url_for(base), scenario_id, reservation.session_id)
+    return web.Response(text=twiml, content_type="application/xml")
+
+
+async def index(request: web.Request) -> web.Response:
+    return web.Response(text="Voice bot server (asyncio) is running. TwiML at /twiml")
+
+
+async def health(request: web.Request) -> web.Response:
+    """503 until readiness.warm_up_async() has built the clients, connections and codec tables."""
+    body, status = readiness.health()
+    return web.json_response(body, status=status)
+
+
+async def admin_profile(request: web.Request) -> web.Response:
+    """Show or change which calls are profiled. POST JSON: {"stream_sids": [...], "sample": 0.1, "off": true}."""
+    # No token configured means no admin access: the server is reachable through ngrok.
+    if not ADMIN_TOKEN or request.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        return web.json_response({"error": "forbidden"}, status=403)
+    if request.method == "POST":
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            return web.json_response({"error": "expected a JSON object"}, status=400)
+        try:
+            settings = profiling.update_settings(body.get("stream_sids"), body.get("sample"), bool(body.get("off")))
+        except ValueError as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response(settings)
+    return web.json_response(profiling.settings())
+
+
+async def calls(request: web.Request) -> web.Response:
+    """Live sessions: state, turn count and buffered inbound bytes per call (+ reply cache stats if on)."""
+    body = registry.snapshot()
+    if response_cache.current() is not None:
+        body["reply_cache"] = response_cache.stats()
+    return web.json_response(body)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    """Same body as server.py's /metrics for this single process (prefork is gevent-only)."""
+    return web.json_response(prefork.summarize([prefork.process_metrics(registry, response_cache.stats())]))
+
+
+async def _start_warm_up(app: web.Application) -> None:
+    # In the background so the port is open (and /health answers 503) while warming.
+    app["warm_up"] = asyncio.create_task(readiness.warm_up_async())
+
+
+def make_app() -> web.Application:
+    app = web.Application()
+    app.on_startup.append(_start_warm_up)
+    app.router.add_get("/", index)
+    app.router.add_get("/health", health)
+    app.router.add_get("/calls", calls)
+    app.router.add_get("/metrics", metrics)
+    app.router.add_route("*", "/admin/profile", admin_profile)
+    app.router.add_route("*", "/twiml", twiml)
+    app.router.add_get("/media", media)
+    return app
+
+
+if __name__ == "__main__":
+    port = int(os.environ.get("PORT", 5050))
+    logger.info("asyncio server listening on port %s (/, /health, /twiml, WebSocket /media)", port)
+    web.run_app(make_app(), port=port, print=None)
@@ -0,0 +1,133 @@
+"""
+Text-only simulation: the patient bot (patient_response_async) talks to a local stand-in
+office agent (office_agents.py) with no telephony, STT or TTS, many conversations at once.
+Use it to sweep patient prompts and scenarios at a rate real calls can't reach.
+
+  python simulate_calls.py --repeat 50 --concurrency 32
+  python simulate_calls.py --scenarios refill,cancel --agent scripted
+  python simulate_calls.py --agent my_agents:FrontDeskBot
+  python simulate_calls.py --repeat 200 --reply-cache 5000   # load test: reuse patient replies
+
+Transcripts (same format as calls, plus a "sim" block) go to transcripts/sim/<run>/, with
+sim_report.json: conversations per minute, turns, patient LLM token usage and reply cache hits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import patient_bot
+import response_cache
+from config import TRANSCRIPTS_DIR
+from office_agents import load_agent
+from scenarios import SCENARIOS, get_scenario
+from transcript_store import transcript_payload, write_json
+
+SIM_DIR = os.path.join(TRANSCRIPTS_DIR, "sim")
+
+
+async def simulate_one(scenario_id: str, agent, max_turns: int) -> tuple[list[dict], int]:
+    """One conversation; returns (conversation, patient replies that fell back after an LLM error)."""
+    scenario = get_scenario(scenario_id)
+    conversation = []
+    if scenario and scenario.first_utterance:
+        conversation.append({"role": "patient", "text": scenario.first_utterance})
+    fallbacks = 0
+    while len(conversation) < max_turns:
+        agent_text = agent.reply(conversation)
+        if agent_text is None:
+            break
+        conversation.append({"role": "agent", "text": agent_text})
+        reply = await patient_bot.patient_response_async(scenario_id, conversation, agent_text)
+        if reply == patient_bot.FALLBACK_REPLY:
+            fallbacks += 1
+        conversation.append({"role": "patient", "text": reply})
+    return conversation, fallbacks
+
+
+async def run(scenario_ids: list[str], repeat: int, agent_cls, concurrency: int, max_turns: int, out_dir: str) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    totals = {"conversations": 0, "turns": 0, "fallbacks": 0, "failed": 0}
+
+    async def one(scenario_id: str, n: int):
+        async with limit:
+            try:
+                conversation, fallbacks = await simulate_one(scenario_id, agent_cls(), max_turns)
+            except Exception as e:
+                totals["failed"] += 1
+                print(f"  {scenario_id} #{n} failed: {e}")
+                return
+            payload = transcript_payload(conversation, scenario_id)
+            payload["sim"] = {"agent": getattr(agent_cls, "name", agent_cls.__name__), "n": n}
+            await asyncio.to_thread(write_json, os.path.join(out_dir, f"sim_{scenario_id}_{n:05d}.json"), payload)
+            totals["conversations"] += 1
+            totals["turns"] += len(conversation)
+            totals["fallbacks"] += fallbacks
+
+    await asyncio.gather(*(one(sid, n) for n in range(repeat) for sid in scenario_ids))
+    return totals
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Simulate patient-bot conversations against a local office agent")
+    ap.add_argument("--scenarios", default="", help="Comma-separated scenario ids (default: all)")
+    ap.add_argument("--repeat", type=int, default=1, help="Conversations per scenario")
+    ap.add_argument("--agent", default="rules", help='"rules", "scripted" or module:ClassName')
+    ap.add_argument("--concurrency", type=int, default=16, help="Conversations in flight at once")
+    ap.add_argument("--max-turns", type=int, default=30, help="Stop a conversation after this many turns")
+    ap.add_argument(
+        "--reply-cache", type=int, default=0, help="Cache up to N patient replies (load tests only; default off)"
+    )
+    ap.add_argument("--out", default="", help="Output directory (default: transcripts/sim/<time>)")
+    args = ap.parse_args()
+
+    scenario_ids = [s.strip() for s in args.scenarios.split(",") if s.strip()] or [s.id for s in SCENARIOS]
+    unknown = [sid for sid in scenario_ids if get_scenario(sid) is None]
+    if unknown:
+        print("Unknown scenario ids:", unknown)
+        sys.exit(1)
+    agent_cls = load_agent(args.agent)
+    if args.reply_cache > 0:
+        response_cache.enable(args.reply_cache)
+    else:
+        response_cache.disable()
+    out_dir = args.out or os.path.join(SIM_DIR, time.strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(out_dir, exist_ok=True)
+
+    total = len(scenario_ids) * args.repeat
+    print(f"Simulating {total} conversation(s) with agent {args.agent!r}, {args.concurrency} at a time...")
+    patient_bot.usage_snapshot(reset=True)
+    t0 = time.perf_counter()
+    totals = asyncio.run(run(scenario_ids, args.repeat, agent_cls, args.concurrency, args.max_turns, out_dir))
+    wall_s = time.perf_counter() - t0
+    usage = patient_bot.usage_snapshot()
+
+    done = totals["conversations"]
+    report = {
+        "agent": args.agent,
+        "scenarios": scenario_ids,
+        "concurrency": args.concurrency,
+        "wall_s": round(wall_s, 2),
+        "conversations_per_min": round(done / wall_s * 60, 1) if wall_s else None,
+        **totals,
+        "usage": usage,
+        "reply_cache": response_cache.stats(),
+        "tokens_per_conversation": round((usage["prompt_tokens"] + usage["completion_tokens"]) / done, 1) if done else None,
+    }
+    with open(os.path.join(out_dir, "sim_report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(
+        f"{done} conversation(s), {totals['turns']} turns in {wall_s:.1f}s "
+        f"({report['conversations_per_min']} conversations/min); "
+        f"{usage['requests']} LLM requests, {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens; "
+        f"{totals['fallbacks']} fallback replies, {totals['failed']} failed"
+    )
+    if report["reply_cache"]:
+        print("Reply cache:", report["reply_cache"])
+    print("Wrote", out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,43 +3,54 @@ Speech-to-Text (Whisper) and Text-to-Speech (OpenAI TTS) with Twilio-compatible
 """
 import io
 import logging
-from typing import Optional
-
-from openai import OpenAI
+from typing import TYPE_CHECKING, Optional
 
 from audio_utils import pcm_24k_to_mulaw_8k, mulaw_buffer_to_wav_io
-from config import OPENAI_API_KEY, OPENAI_API_BASE
+from config import LIVE_STT_MODEL, PATIENT_VOICE, SAMPLE_RATE_TWILIO
+from cooperative import run_cpu, run_cpu_async
+from openai_clients import make_async_client, make_client
+from profiling import span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
 
 logger = logging.getLogger(__name__)
 
-_client: Optional[OpenAI] = None
+_client: Optional["OpenAI"] = None
+_async_client: Optional["AsyncOpenAI"] = None
 
 
-def _client_or_default() -> OpenAI:
+def _client_or_default() -> "OpenAI":
     global _client
     if _client is None:
-        kwargs = {"api_key": OPENAI_API_KEY}
-        if OPENAI_API_BASE:
-            kwargs["base_url"] = OPENAI_API_BASE
-        _client = OpenAI(**kwargs)
+        _client = make_client()
     return _client
 
 
-def transcribe_mulaw(mulaw_bytes: bytes) -> str:
+def _async_client_or_default() -> "AsyncOpenAI":
+    global _async_client
+    if _async_client is None:
+        _async_client = make_async_client()
+    return _async_client
+
+
+def transcribe_mulaw(mulaw_bytes: bytes, model: str = LIVE_STT_MODEL) -> str:
     """
-    Transcribe 8kHz mulaw audio (from Twilio) to text using Whisper.
+    Transcribe 8kHz mulaw audio (from Twilio) to text (Whisper, or VOICE_BOT_LIVE_STT_MODEL).
     Returns empty string if audio is too short or silent.
     """
     if len(mulaw_bytes) < 800:  # < ~50ms
         return ""
     try:
-        wav_io = mulaw_buffer_to_wav_io(mulaw_bytes)
+        with span("stt.wav_encode"):
+            wav_io = run_cpu(mulaw_buffer_to_wav_io, mulaw_bytes)
         client = _client_or_default()
         wav_io.name = "audio.wav"
-        r = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=wav_io,
-        )
+        with span("stt.whisper_wait"):
+            r = client.audio.transcriptions.create(
+                model=model,
+                file=wav_io,
+            )
         text = (r.text or "").strip()
         return text
     except Exception as e:
@@ -47,9 +58,44 @@ def transcribe_mulaw(mulaw_bytes: bytes) -> str:
         return ""
 
 
+# Whisper accepts files up to 25 MB; 8 kHz 16-bit WAV is 16 KB/s, so send at most 20 min at once.
+_SEGMENT_REQUEST_BYTES = SAMPLE_RATE_TWILIO * 60 * 20
+
+
+def transcribe_segments(mulaw_bytes: bytes, model: str = "whisper-1", client: Optional["OpenAI"] = None) -> list[dict]:
+    """
+    Transcribe a whole recording in as few requests as possible, returning timed segments
+    [{"start_ms", "end_ms", "text"}] relative to the start of the audio. Raises on failure
+    (the post-call job logs it; nothing is waiting on it live). Pass a client of your own to
+    keep these long uploads out of the live client's connection pool.
+    """
+    segments = []
+    client = client or _client_or_default()
+    for offset in range(0, len(mulaw_bytes), _SEGMENT_REQUEST_BYTES):
+        piece = mulaw_bytes[offset : offset + _SEGMENT_REQUEST_BYTES]
+        if len(piece) < 800:
+            continue
+        wav_io = run_cpu(mulaw_buffer_to_wav_io, piece)
+        wav_io.name = "audio.wav"
+        r = client.audio.transcriptions.create(
+            model=model,
+            file=wav_io,
+            response_format="verbose_json",
+            timestamp_granularities=["segment"],
+        )
+        base_ms = offset * 1000 // SAMPLE_RATE_TWILIO
+        for seg in r.segments or []:
+            text = (seg.text or "").strip()
+            if text:
+                segments.append(
+                    {"start_ms": base_ms + int(seg.start * 1000), "end_ms": base_ms + int(seg.end * 1000), "text": text}
+                )
+    return segments
+
+
 def text_to_mulaw(
     text: str,
-    voice: str = "nova",
+    voice: str = PATIENT_VOICE,
     model: str = "tts-1",
 ) -> bytes:
     """
@@ -59,12 +105,53 @@ def text_to_mulaw(
     if not text.strip():
         return b""
     client = _client_or_default()
-    response = client.audio.speech.create(
-        model=model,
-        voice=voice,
-        input=text,
-        response_format="pcm",
-        speed=1.0,
-    )
-    pcm_24k = response.content
-    return pcm_24k_to_mulaw_8k(pcm_24k)
+    with span("tts.speech_wait"):
+        response = client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format="pcm",
+            speed=1.0,
+        )
+        pcm_24k = response.content
+    with span("tts.mulaw_encode"):
+        return run_cpu(pcm_24k_to_mulaw_8k, pcm_24k)
+
+
+async def transcribe_mulaw_async(mulaw_bytes: bytes, model: str = LIVE_STT_MODEL) -> str:
+    """asyncio version of transcribe_mulaw (AsyncOpenAI; WAV encoding off the event loop)."""
+    if len(mulaw_bytes) < 800:
+        return ""
+    try:
+        with span("stt.wav_encode"):
+            wav_io = await run_cpu_async(mulaw_buffer_to_wav_io, mulaw_bytes)
+        wav_io.name = "audio.wav"
+        with span("stt.whisper_wait"):
+            r = await _async_client_or_default().audio.transcriptions.create(
+                model=model,
+                file=wav_io,
+            )
+        return (r.text or "").strip()
+    except Exception as e:
+        logger.warning("Transcribe failed: %s", e)
+        return ""
+
+
+async def text_to_mulaw_async(
+    text: str,
+    voice: str = PATIENT_VOICE,
+    model: str = "tts-1",
+) -> bytes:
+    """asyncio version of text_to_mulaw."""
+    if not text.strip():
+        return b""
+    with span("tts.speech_wait"):
+        response = await _async_client_or_default().audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format="pcm",
+            speed=1.0,
+        )
+    with span("tts.mulaw_encode"):
+        return await run_cpu_async(pcm_24k_to_mulaw_8k, response.content)
@@ -0,0 +1,47 @@
+"""CallRegistry admission: a /twiml reservation and its /media stream share one slot."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from call_sessions import CallRegistry, CallState  # noqa: E402
+
+
+def test_admitted_call_opens_its_stream_and_the_next_call_is_refused():
+    registry = CallRegistry(max_calls=1)
+    reservation = registry.admit("schedule_new")
+    assert reservation is not None
+
+    session = registry.open_stream()
+    assert session is not None
+    assert registry.active_count() == 1
+    assert registry.admit("refill") is None  # before the start event
+
+    registry.claim(session, reservation.session_id)
+    assert registry.active_count() == 1
+    assert registry.admit("refill") is None  # after it
+
+    registry.close(session)
+    assert registry.active_count() == 0
+    assert registry.admit("refill") is not None
+
+
+def test_stream_that_took_another_calls_slot_gives_it_back():
+    registry = CallRegistry(max_calls=2)
+    first = registry.admit("schedule_new")
+    second = registry.admit("refill")
+
+    # The second call's stream connects first and holds the oldest reservation's slot.
+    stream = registry.open_stream()
+    assert registry.active_count() == 2
+    registry.claim(stream, second.session_id)
+
+    pending = [c["session_id"] for c in registry.snapshot()["calls"] if c["state"] == CallState.PENDING]
+    assert pending == [first.session_id]
+    assert registry.active_count() == 2
+    assert registry.admit("refill") is None
+
+    other = registry.open_stream()
+    registry.claim(other, first.session_id)
+    assert registry.active_count() == 2
+    assert all(c["state"] == CallState.CONNECTED for c in registry.snapshot()["calls"])
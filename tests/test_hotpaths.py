@@ -0,0 +1,20 @@
+"""benchmarks.hotpaths.compare: slowdowns and benchmarks missing from the current run."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.hotpaths import compare  # noqa: E402
+
+BASELINE = {"results": {"a": {"value": 100.0, "unit": "audio_s/s"}, "b": {"value": 100.0, "unit": "audio_s/s"}}}
+
+
+def test_slowdown_past_threshold_fails():
+    current = {"results": {"a": {"value": 85.0, "unit": "audio_s/s"}, "b": {"value": 95.0, "unit": "audio_s/s"}}}
+    assert compare(BASELINE, current, 0.10) == ["a"]
+
+
+def test_missing_benchmark_fails_unless_allowed():
+    current = {"results": {"a": {"value": 100.0, "unit": "audio_s/s"}}}
+    assert compare(BASELINE, current, 0.10) == ["b"]
+    assert compare(BASELINE, current, 0.10, allow_missing=True) == []
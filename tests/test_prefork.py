@@ -0,0 +1,129 @@
+"""Two prefork workers of server.py on an ephemeral port: both serve, and SIGHUP drains without cutting a stream."""
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+for module in ("gevent", "geventwebsocket", "flask", "flask_sockets", "aiohttp"):
+    pytest.importorskip(module)
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _children(pid: int) -> set[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return {int(p) for p in f.read().split()}
+
+
+def _alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().split()[2] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def _wait_for(predicate, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.1)
+    raise AssertionError("timed out")
+
+
+@pytest.fixture
+def supervisor():
+    port = _free_port()
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "VOICE_BOT_WORKERS": "2",
+        "VOICE_BOT_WEBSOCKET": "1",
+        "VOICE_BOT_DRAIN_SECONDS": "60",
+        "OPENAI_API_KEY": "",
+    }
+    env.pop("VOICE_BOT_WORKER_ID", None)
+    proc = subprocess.Popen(
+        [sys.executable, "server.py"], cwd=REPO, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    yield proc, port
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def _health(port: int):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2) as r:
+            return json.load(r)
+    except OSError:
+        return None
+
+
+def test_two_workers_serve_and_sighup_keeps_open_stream(supervisor):
+    proc, port = supervisor
+    if not sys.platform.startswith("linux"):
+        pytest.skip("reads worker pids from /proc")
+
+    seen = {}
+
+    def both_workers_answered():
+        body = _health(port)
+        if body and body.get("ready"):
+            seen[body["worker"]] = body["pid"]
+        return len(seen) == 2
+
+    _wait_for(both_workers_answered)
+    assert set(seen) == {"0", "1"}
+    old_workers = set(seen.values())
+    assert _children(proc.pid) == old_workers
+
+    async def call():
+        import aiohttp
+
+        async with aiohttp.ClientSession() as http:
+            async with http.ws_connect(f"ws://127.0.0.1:{port}/media") as ws:
+                await ws.send_str(json.dumps({"event": "connected"}))
+                start = {"streamSid": "MZtest", "callSid": "CAtest", "customParameters": {"scenario_id": "none"}}
+                await ws.send_str(json.dumps({"event": "start", "streamSid": "MZtest", "start": start}))
+                await asyncio.sleep(1)
+
+                proc.send_signal(signal.SIGHUP)
+                # Each slot gets a fresh worker; the idle old worker exits, the one holding the stream stays.
+                await asyncio.to_thread(_wait_for, lambda: len(_children(proc.pid) - old_workers) == 2)
+                await asyncio.to_thread(_wait_for, lambda: sum(map(_alive, old_workers)) == 1)
+                holder = next(pid for pid in old_workers if _alive(pid))
+                await asyncio.sleep(2)
+                assert _alive(holder)
+
+                media = {"event": "media", "media": {"track": "inbound", "payload": "f" * 212, "timestamp": "20"}}
+                await ws.send_str(json.dumps(media))
+                with pytest.raises(asyncio.TimeoutError):
+                    await ws.receive(timeout=1)  # nothing to say back, and the stream wasn't closed
+                assert not ws.closed
+            return holder
+
+    holder = asyncio.run(call())
+    # The stream has ended, so the drained worker exits.
+    _wait_for(lambda: not _alive(holder))
+    _wait_for(lambda: _children(proc.pid) and not _children(proc.pid) & old_workers)  # reaped by the supervisor
+    assert len(_children(proc.pid)) == 2
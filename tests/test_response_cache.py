@@ -0,0 +1,41 @@
+"""ReplyCache keys and when a key starts answering from the cache."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from response_cache import ReplyCache, normalize  # noqa: E402
+
+CONVERSATION = [{"role": "agent", "text": "Hi, this is the office."}, {"role": "patient", "text": "Hi, I need an appointment."}]
+
+
+def test_leading_filler_is_dropped():
+    assert normalize("Okay, um, what's your date of birth?") == "what's your date of birth"
+    assert normalize("Thanks. Anything else?") == "anything else"
+
+
+def test_prompts_that_differ_in_meaning_get_different_keys():
+    key = ReplyCache.key
+    assert key("s", CONVERSATION, "So you want Tuesday?") != key("s", CONVERSATION, "You want Tuesday?")
+    assert key("s", CONVERSATION, "And your phone number?") != key("s", CONVERSATION, "Your phone number?")
+    assert key("s", CONVERSATION, "All right?") != key("s", CONVERSATION, "Right?")
+
+
+def test_repeated_identical_answer_fills_the_key():
+    cache = ReplyCache(variants=3)
+    key = ReplyCache.key("s", CONVERSATION, "Can I get your name?")
+    for _ in range(3):
+        assert cache.get(key) is None
+        cache.put(key, "Minh Huynh.")
+    assert cache.get(key) == "Minh Huynh."
+    assert cache.stats()["hits"] == 1
+
+
+def test_variants_are_kept_with_their_repeats():
+    cache = ReplyCache(variants=3)
+    key = ReplyCache.key("s", CONVERSATION, "Can I get your name?")
+    for reply in ("Minh Huynh.", "Minh Huynh.", "It's Minh."):
+        cache.put(key, reply)
+    cache.put(key, "Ignored, the key is full.")
+    replies = {cache.get(key) for _ in range(200)}
+    assert replies == {"Minh Huynh.", "It's Minh."}
@@ -0,0 +1,57 @@
+"""retranscribe.enqueue hands the job to a worker thread and returns without running it."""
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import retranscribe  # noqa: E402
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(retranscribe, "_pool", None)
+    yield
+    if retranscribe._pool is not None:
+        retranscribe._pool.shutdown(wait=True)
+
+
+def _record_thread(monkeypatch):
+    seen = {}
+    started = threading.Event()
+    release = threading.Event()
+
+    def fake_retranscribe_file(path):
+        seen["thread"] = threading.get_ident()
+        started.set()
+        release.wait(5)
+        return path + ".corrected"
+
+    monkeypatch.setattr(retranscribe, "retranscribe_file", fake_retranscribe_file)
+    return seen, started, release
+
+
+def test_enqueue_runs_the_job_off_the_calling_thread(monkeypatch, fresh_pool):
+    seen, started, release = _record_thread(monkeypatch)
+    future = retranscribe.enqueue("call.json")
+    assert started.wait(5)
+    assert not future.done()  # enqueue returned while the job was still running
+    release.set()
+    assert future.result(5) == "call.json.corrected"
+    assert seen["thread"] != threading.get_ident()
+
+
+def test_enqueue_uses_native_threads_under_gevent(monkeypatch, fresh_pool):
+    pytest.importorskip("gevent")
+    from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+
+    monkeypatch.setattr(retranscribe, "gevent_active", lambda: True)
+    seen, started, release = _record_thread(monkeypatch)
+    future = retranscribe.enqueue("call.json")
+    assert isinstance(retranscribe._pool, NativeThreadPoolExecutor)
+    assert started.wait(5)
+    release.set()
+    assert future.result(5) == "call.json.corrected"
+    assert seen["thread"] != threading.get_ident()
@@ -0,0 +1,72 @@
+"""TurnTable build / concat / save / load / summarize, including the empty table."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+np = pytest.importorskip("numpy")
+
+from turn_table import TurnTable, print_summary  # noqa: E402
+
+CALLS = [
+    (
+        "call_CA1_refill_1.json",
+        {
+            "call_sid": "CA1",
+            "scenario_id": "refill",
+            "transcript": [
+                {"role": "patient", "text": "Hi, I need a refill.", "start_ms": 0, "end_ms": 1500},
+                {"role": "agent", "text": "Sure, date of birth?", "start_ms": 2000, "end_ms": 3000},
+                {"role": "patient", "text": "July fourteenth, café"},
+            ],
+        },
+    ),
+    ("call_CA2_cancel_2.json", {"call_sid": "CA2", "scenario_id": "cancel", "transcript": []}),
+    (
+        "call_CA3_refill_3.json",
+        {"call_sid": "CA3", "scenario_id": "refill", "transcript": [{"role": "agent", "text": "Hello"}]},
+    ),
+]
+
+
+def _roundtrip(table: TurnTable, tmp_path) -> TurnTable:
+    path = str(tmp_path / "turns.npz")
+    table.save(path)
+    return TurnTable.load(path)
+
+
+@pytest.mark.parametrize(
+    "table",
+    [TurnTable.empty(), TurnTable.concat([]), TurnTable.from_transcripts([]), TurnTable.from_transcripts(CALLS[1:2])],
+    ids=["empty", "concat-none", "no-calls", "zero-turn-call"],
+)
+def test_empty_table(table, tmp_path, capsys):
+    loaded = _roundtrip(TurnTable.concat([table, TurnTable.empty()]), tmp_path)
+    assert len(loaded) == 0
+    assert loaded.words_per_role() == {"agent": 0, "patient": 0, "other": 0}
+    assert loaded.words_per_role_by_scenario() == ({"cancel": {}} if loaded.n_calls else {})
+    assert loaded.rows_containing("x").size == 0
+    print_summary(loaded)
+    assert "0 turn(s)" in capsys.readouterr().out
+
+
+def test_small_table(tmp_path, capsys):
+    parts = [TurnTable.from_transcripts(CALLS[:1]), TurnTable.from_transcripts(CALLS[1:])]
+    table = _roundtrip(TurnTable.concat(parts), tmp_path)
+
+    assert table.n_calls == 3 and len(table) == 4
+    assert list(table.calls["call_sid"]) == ["CA1", "CA2", "CA3"]
+    assert table.turns_per_call().tolist() == [3, 0, 1]
+    assert table.turns_per_call("patient").tolist() == [2, 0, 0]
+    assert table.words_per_role() == {"agent": 5, "patient": 8, "other": 0}
+    assert table.words_per_role_by_scenario() == {"cancel": {}, "refill": {"agent": 2.5, "patient": 4.0}}
+    assert table.turns_per_scenario() == {"cancel": (1, 0.0), "refill": (2, 2.0)}
+    assert [table.text(i) for i in range(len(table))][2:] == ["July fourteenth, café", "Hello"]
+    assert table.chars[2] == len("July fourteenth, café")
+    assert table.start_ms.tolist() == [0, 2000, -1, -1]
+    assert table.rows_containing("DATE OF").tolist() == [1]
+    assert table.rows_containing("Café").tolist() == [2]
+    print_summary(table)
+    assert "3 call(s), 4 turn(s)" in capsys.readouterr().out
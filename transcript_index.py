@@ -0,0 +1,278 @@
+"""
+Local SQLite index over saved transcripts, for querying without reopening every JSON file.
+  calls      one row per transcript: file, scenario_id, call_sid, turn counts, saved_at, mtime
+  turns      one row per turn: call, turn index, role, text
+  turns_fts  FTS5 full-text index on turn text (external content over turns)
+Kept up to date incrementally: files are re-read only when their mtime changes, deleted
+files are dropped, and both servers index each final transcript as it is saved.
+
+  python transcript_index.py update
+  python transcript_index.py search "date of birth" --role agent --scenario schedule_new
+  python transcript_index.py calls --scenario refill --min-turns 20
+  python transcript_index.py calls --scenario schedule_new --without-text "birth" --role agent
+  python transcript_index.py stats
+
+Text queries use FTS5 syntax: words are ANDed, "quoted phrases", OR, prefix*.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Optional
+
+from config import TRANSCRIPT_INDEX_PATH, TRANSCRIPTS_DIR
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL UNIQUE,
+    mtime REAL NOT NULL,
+    scenario_id TEXT,
+    call_sid TEXT,
+    turns INTEGER NOT NULL,
+    agent_turns INTEGER NOT NULL,
+    patient_turns INTEGER NOT NULL,
+    saved_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_scenario ON calls (scenario_id, turns);
+CREATE INDEX IF NOT EXISTS calls_saved_at ON calls (saved_at);
+CREATE INDEX IF NOT EXISTS calls_call_sid ON calls (call_sid);
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    call_id INTEGER NOT NULL REFERENCES calls (id) ON DELETE CASCADE,
+    turn_index INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_call ON turns (call_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS turns_fts USING fts5 (text, content='turns', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS turns_ai AFTER INSERT ON turns BEGIN
+    INSERT INTO turns_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS turns_ad AFTER DELETE ON turns BEGIN
+    INSERT INTO turns_fts (turns_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+# Final transcripts only: call_live_* files are rewritten every turn and removed at the end,
+# and .corrected.json re-transcriptions (retranscribe.py) would index each call twice.
+_FINAL_NAME = re.compile(r"^call_(?!live_)(?!.*\.corrected\.json$).*\.json$")
+_SAVED_AT = re.compile(r"_(\d{9,})\.json$")
+
+
+def connect(path: str = TRANSCRIPT_INDEX_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _index_one(conn: sqlite3.Connection, path: str, mtime: float) -> None:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    turns = [t for t in data.get("transcript") or data.get("conversation") or [] if isinstance(t, dict)]
+    name = os.path.basename(path)
+    m = _SAVED_AT.search(name)
+    saved_at = int(m.group(1)) if m else int(mtime)
+    roles = [t.get("role", "") for t in turns]
+    conn.execute("DELETE FROM calls WHERE file = ?", (name,))
+    cur = conn.execute(
+        "INSERT INTO calls (file, mtime, scenario_id, call_sid, turns, agent_turns, patient_turns, saved_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            name,
+            mtime,
+            data.get("scenario_id"),
+            data.get("call_sid"),
+            len(turns),
+            roles.count("agent"),
+            roles.count("patient"),
+            saved_at,
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO turns (call_id, turn_index, role, text) VALUES (?, ?, ?, ?)",
+        [(cur.lastrowid, i, t.get("role", ""), t.get("text") or "") for i, t in enumerate(turns)],
+    )
+
+
+def index_file(path: str, db_path: str = TRANSCRIPT_INDEX_PATH) -> None:
+    """Add or refresh one transcript (called by the servers after the final save)."""
+    conn = connect(db_path)
+    try:
+        with conn:
+            _index_one(conn, path, os.stat(path).st_mtime)
+    finally:
+        conn.close()
+
+
+def update(directory: str = TRANSCRIPTS_DIR, db_path: str = TRANSCRIPT_INDEX_PATH) -> dict:
+    """Bring the index in line with directory: index new/changed files, drop deleted ones."""
+    conn = connect(db_path)
+    try:
+        known = dict(conn.execute("SELECT file, mtime FROM calls"))
+        seen, added, failed = set(), 0, 0
+        with conn:
+            for entry in os.scandir(directory):
+                if not _FINAL_NAME.match(entry.name) or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                mtime = entry.stat().st_mtime
+                if known.get(entry.name) == mtime:
+                    continue
+                try:
+                    _index_one(conn, entry.path, mtime)
+                    added += 1
+                except Exception as e:
+                    failed += 1
+                    logger.warning("Skip %s: %s", entry.path, e)
+            removed = [name for name in known if name not in seen]
+            conn.executemany("DELETE FROM calls WHERE file = ?", [(name,) for name in removed])
+        return {"indexed": added, "removed": len(removed), "failed": failed, "total": len(seen) - failed}
+    finally:
+        conn.close()
+
+
+def search(
+    conn: sqlite3.Connection, query: str, role: str = "", scenario_id: str = "", limit: int = 20
+) -> list[tuple]:
+    """Turns matching an FTS5 query: (file, scenario_id, turn_index, role, snippet), best first."""
+    sql = (
+        "SELECT c.file, c.scenario_id, t.turn_index, t.role, snippet(turns_fts, 0, '[', ']', '…', 12)"
+        " FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid JOIN calls c ON c.id = t.call_id"
+        " WHERE turns_fts MATCH ?"
+    )
+    params: list = [query]
+    if role:
+        sql += " AND t.role = ?"
+        params.append(role)
+    if scenario_id:
+        sql += " AND c.scenario_id = ?"
+        params.append(scenario_id)
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def find_calls(
+    conn: sqlite3.Connection,
+    scenario_id: str = "",
+    call_sid: str = "",
+    min_turns: Optional[int] = None,
+    max_turns: Optional[int] = None,
+    since: Optional[int] = None,
+    until: Optional[int] = None,
+    with_text: str = "",
+    without_text: str = "",
+    role: str = "",
+    limit: int = 100,
+) -> list[tuple]:
+    """Calls by field filters, and by whether any turn (of role, if given) matches a text query.
+    Returns (file, scenario_id, call_sid, turns, saved_at), newest first."""
+    where, params = [], []
+    for clause, value in (
+        ("scenario_id = ?", scenario_id),
+        ("call_sid = ?", call_sid),
+        ("turns >= ?", min_turns),
+        ("turns <= ?", max_turns),
+        ("saved_at >= ?", since),
+        ("saved_at <= ?", until),
+    ):
+        if value not in ("", None):
+            where.append(clause)
+            params.append(value)
+    matching = "SELECT t.call_id FROM turns_fts JOIN turns t ON t.id = turns_fts.rowid WHERE turns_fts MATCH ?"
+    if role:
+        matching += " AND t.role = ?"
+    for text, op in ((with_text, "IN"), (without_text, "NOT IN")):
+        if text:
+            where.append(f"id {op} ({matching})")
+            params.extend([text, role] if role else [text])
+    sql = "SELECT file, scenario_id, call_sid, turns, saved_at FROM calls"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY saved_at DESC LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def stats(conn: sqlite3.Connection) -> dict:
+    calls, turns = conn.execute("SELECT COUNT(*), COALESCE(SUM(turns), 0) FROM calls").fetchone()
+    by_scenario = dict(conn.execute("SELECT scenario_id, COUNT(*) FROM calls GROUP BY scenario_id ORDER BY 2 DESC"))
+    return {"calls": calls, "turns": turns, "by_scenario": by_scenario}
+
+
+def _date(value: str) -> Optional[int]:
+    """Unix seconds from "YYYY-MM-DD" or a number."""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(time.mktime(time.strptime(value, "%Y-%m-%d")))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Index and query saved transcripts")
+    ap.add_argument("--db", default=TRANSCRIPT_INDEX_PATH)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_update = sub.add_parser("update", help="Index new/changed transcripts, drop deleted ones")
+    p_update.add_argument("--dir", default=TRANSCRIPTS_DIR)
+    p_search = sub.add_parser("search", help="Turns matching a text query")
+    p_search.add_argument("query")
+    p_calls = sub.add_parser("calls", help="Calls matching field and text filters")
+    p_calls.add_argument("--call-sid", default="")
+    p_calls.add_argument("--min-turns", type=int)
+    p_calls.add_argument("--max-turns", type=int)
+    p_calls.add_argument("--since", default="", help="YYYY-MM-DD or unix seconds")
+    p_calls.add_argument("--until", default="", help="YYYY-MM-DD or unix seconds")
+    p_calls.add_argument("--with-text", default="", help="Some turn matches this query")
+    p_calls.add_argument("--without-text", default="", help="No turn matches this query")
+    for p in (p_search, p_calls):
+        p.add_argument("--scenario", default="")
+        p.add_argument("--role", default="", choices=("", "agent", "patient"))
+        p.add_argument("--limit", type=int, default=20)
+    sub.add_parser("stats", help="Indexed calls and turns per scenario")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.cmd == "update":
+        print(update(args.dir, args.db))
+    else:
+        conn = connect(args.db)
+        if args.cmd == "search":
+            for file, scenario_id, turn_index, role, snippet in search(
+                conn, args.query, args.role, args.scenario, args.limit
+            ):
+                print(f"{file} [{scenario_id}] #{turn_index} {role}: {snippet}")
+        elif args.cmd == "calls":
+            rows = find_calls(
+                conn,
+                scenario_id=args.scenario,
+                call_sid=args.call_sid,
+                min_turns=args.min_turns,
+                max_turns=args.max_turns,
+                since=_date(args.since),
+                until=_date(args.until),
+                with_text=args.with_text,
+                without_text=args.without_text,
+                role=args.role,
+                limit=args.limit,
+            )
+            for file, scenario_id, call_sid, turns, saved_at in rows:
+                print(f"{file} [{scenario_id}] {call_sid or '-'} {turns} turns {time.strftime('%Y-%m-%d %H:%M', time.localtime(saved_at))}")
+        else:
+            print(json.dumps(stats(conn), indent=2))
+        conn.close()
+    print(f"({(time.perf_counter() - t0) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
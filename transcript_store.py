@@ -0,0 +1,47 @@
+"""
+Transcript JSON files: {"scenario_id", "transcript": [{"role", "text"}, ...], "call_sid"?, "fillers"?, "recording"?}.
+"fillers" lists filler clips played while waiting on a reply; they are not turns.
+"recording" is the inbound-track .ulaw file when the call was recorded (see recordings.py).
+<name>.corrected.json next to a transcript is its post-call re-transcription (retranscribe.py);
+readers that want the best text should prefer it (preferred_path).
+Shared by both media servers; callers decide how to keep the write off their event loop.
+"""
+import json
+import os
+
+CORRECTED_SUFFIX = ".corrected.json"
+
+
+def transcript_payload(
+    conversation: list, scenario_id: str, call_sid: str = None, fillers: list = None, recording: str = None
+) -> dict:
+    payload = {"scenario_id": scenario_id, "transcript": conversation}
+    if call_sid:
+        payload["call_sid"] = call_sid
+    if fillers:
+        payload["fillers"] = fillers
+    if recording:
+        payload["recording"] = recording
+    return payload
+
+
+def write_json(path: str, payload: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+
+
+def corrected_path(path: str) -> str:
+    return path[: -len(".json")] + CORRECTED_SUFFIX if path.endswith(".json") else path + CORRECTED_SUFFIX
+
+
+def is_corrected(path: str) -> bool:
+    return path.endswith(CORRECTED_SUFFIX)
+
+
+def preferred_path(path: str) -> str:
+    """The corrected version of a transcript if one exists, else the transcript itself."""
+    if is_corrected(path):
+        return path
+    corrected = corrected_path(path)
+    return corrected if os.path.isfile(corrected) else path
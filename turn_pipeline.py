@@ -0,0 +1,65 @@
+"""
+The stages of one conversational turn, shared by the live servers and replay_calls.py:
+STT on the agent's buffered audio, then the patient reply (LLM) and its audio (TTS).
+Each stage's wall time is recorded into a caller-supplied timings dict (milliseconds), and
+turns carry their stage times plus start_ms/end_ms on the call's media clock.
+"""
+import time
+from typing import Optional
+
+from audio_utils import voiced_span_ms
+from call_sessions import Utterance
+from config import SAMPLE_RATE_TWILIO
+from patient_bot import patient_response
+from stt_tts import text_to_mulaw, transcribe_mulaw
+
+
+def _timed(timings: dict, key: str, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        timings[key] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def transcribe_agent(mulaw: bytes, timings: dict) -> str:
+    """STT stage: the agent's utterance as text ("" if nothing usable was heard)."""
+    return _timed(timings, "stt_ms", transcribe_mulaw, mulaw)
+
+
+def agent_turn(text: str, utterance: Utterance, timings: dict) -> dict:
+    """Agent turn with start_ms/end_ms narrowed to where speech is in the buffer."""
+    turn = {"role": "agent", "text": text, **timings}
+    if utterance.start_ms is not None:
+        span = voiced_span_ms(utterance.audio)
+        first, last = span if span else (0, len(utterance.audio) * 1000 // SAMPLE_RATE_TWILIO)
+        turn["start_ms"] = utterance.start_ms + first
+        turn["end_ms"] = utterance.start_ms + last
+    return turn
+
+
+def mark_played(turn: dict, start_ms: Optional[int], mulaw_audio: bytes) -> None:
+    """Stamp a patient turn with when its audio started on the media clock and how long it ran."""
+    if start_ms is None:
+        return
+    turn["start_ms"] = start_ms
+    turn["end_ms"] = start_ms + len(mulaw_audio) * 1000 // SAMPLE_RATE_TWILIO
+
+
+def reply_to_agent(
+    scenario_id: str,
+    conversation: list[dict],
+    agent_text: str,
+    timings: dict,
+    synthesize: bool = True,
+) -> tuple[dict, bytes]:
+    """LLM + TTS stages. Appends the patient turn (with llm_ms/tts_ms) to conversation;
+    returns (that turn, mulaw audio)."""
+    reply = _timed(timings, "llm_ms", patient_response, scenario_id, conversation, agent_text)
+    turn = {"role": "patient", "text": reply, "llm_ms": timings["llm_ms"]}
+    conversation.append(turn)
+    if not synthesize or not reply.strip():
+        return turn, b""
+    audio = _timed(timings, "tts_ms", text_to_mulaw, reply)
+    turn["tts_ms"] = timings["tts_ms"]
+    return turn, audio
@@ -0,0 +1,215 @@
+"""
+Columnar table of every transcript turn (built by `python export_transcripts.py --table`),
+so aggregate questions are a few NumPy operations instead of re-parsing JSON or Markdown.
+
+One row per turn, typed columns:
+  call      int32   row in the per-call columns (call_sid, scenario, file)
+  turn      int32   index of the turn within its call
+  role      int8    ROLES index (agent, patient, other)
+  chars     int32   text length in characters
+  words     int32   whitespace-separated words
+  start_ms  int32   media-clock start (-1 when unknown); end_ms likewise
+Turn text lives in one UTF-8 heap (text_heap) with text_offsets[i]:text_offsets[i + 1] per row.
+Stored as a compressed .npz without pickled objects.
+
+  python turn_table.py [transcripts/export/turns.npz]     # summary: turns per call, words per role
+"""
+import argparse
+import os
+from typing import Optional
+
+import numpy as np
+
+from config import TRANSCRIPTS_DIR
+
+TABLE_PATH = os.path.join(TRANSCRIPTS_DIR, "export", "turns.npz")
+ROLES = ("agent", "patient", "other")
+TURN_COLUMNS = {
+    "call": np.int32,
+    "turn": np.int32,
+    "role": np.int8,
+    "chars": np.int32,
+    "words": np.int32,
+    "start_ms": np.int32,
+    "end_ms": np.int32,
+}
+CALL_COLUMNS = ("call_sid", "scenario_id", "file")
+
+
+def role_code(role: str) -> int:
+    return ROLES.index(role) if role in ROLES[:2] else 2
+
+
+class TurnTable:
+    def __init__(self, columns: dict, text_heap: np.ndarray, text_offsets: np.ndarray, calls: dict):
+        for name, dtype in TURN_COLUMNS.items():
+            setattr(self, name, np.asarray(columns[name], dtype=dtype))
+        self.text_heap = np.asarray(text_heap, dtype=np.uint8)
+        self.text_offsets = np.asarray(text_offsets, dtype=np.int64)
+        self.calls = {name: np.asarray(calls[name], dtype=str) for name in CALL_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.call)
+
+    @property
+    def columns(self) -> dict:
+        return {name: getattr(self, name) for name in TURN_COLUMNS}
+
+    @property
+    def n_calls(self) -> int:
+        return len(self.calls["call_sid"])
+
+    # --- storage ---
+
+    def save(self, path: str = TABLE_PATH) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp,
+            text_heap=self.text_heap,
+            text_offsets=self.text_offsets,
+            **self.columns,
+            **{f"calls_{name}": values for name, values in self.calls.items()},
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = TABLE_PATH) -> "TurnTable":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                {name: data[name] for name in TURN_COLUMNS},
+                data["text_heap"],
+                data["text_offsets"],
+                {name: data[f"calls_{name}"] for name in CALL_COLUMNS},
+            )
+
+    @classmethod
+    def from_transcripts(cls, items) -> "TurnTable":
+        """Build from (file name, transcript dict) pairs."""
+        columns = {name: [] for name in TURN_COLUMNS}
+        calls = {name: [] for name in CALL_COLUMNS}
+        texts = []
+        for file, data in items:
+            call = len(calls["file"])
+            calls["call_sid"].append(data.get("call_sid") or "")
+            calls["scenario_id"].append(data.get("scenario_id") or "")
+            calls["file"].append(file)
+            for i, turn in enumerate(data.get("transcript") or data.get("conversation") or []):
+                text = (turn.get("text") or "").encode("utf-8")
+                texts.append(text)
+                columns["call"].append(call)
+                columns["turn"].append(i)
+                columns["role"].append(role_code(turn.get("role")))
+                columns["chars"].append(len(turn.get("text") or ""))
+                columns["words"].append(len(text.split()))
+                start, end = turn.get("start_ms"), turn.get("end_ms")
+                columns["start_ms"].append(-1 if start is None else start)
+                columns["end_ms"].append(-1 if end is None else end)
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in texts], out=offsets[1:])
+        heap = np.frombuffer(b"".join(texts), dtype=np.uint8)
+        return cls(columns, heap, offsets, calls)
+
+    @classmethod
+    def concat(cls, parts: list["TurnTable"]) -> "TurnTable":
+        """Stack tables built from disjoint sets of files (e.g. by worker processes)."""
+        if not parts:
+            return cls.empty()
+        call_base = np.cumsum([0] + [p.n_calls for p in parts[:-1]])
+        heap_base = np.cumsum([0] + [len(p.text_heap) for p in parts[:-1]])
+        columns = {name: np.concatenate([p.columns[name] for p in parts]) for name in TURN_COLUMNS}
+        columns["call"] = np.concatenate([p.call + base for p, base in zip(parts, call_base)])
+        offsets = np.concatenate([[0]] + [p.text_offsets[1:] + base for p, base in zip(parts, heap_base)])
+        calls = {name: np.concatenate([p.calls[name] for p in parts]) for name in CALL_COLUMNS}
+        return cls(columns, np.concatenate([p.text_heap for p in parts]), offsets, calls)
+
+    @classmethod
+    def empty(cls) -> "TurnTable":
+        return cls({name: [] for name in TURN_COLUMNS}, [], [0], {name: [] for name in CALL_COLUMNS})
+
+    # --- row access ---
+
+    def text(self, row: int) -> str:
+        return self.text_heap[self.text_offsets[row] : self.text_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def rows_containing(self, needle: str, ignore_case: bool = True) -> np.ndarray:
+        """Rows whose text contains needle: one scan of the heap, no per-row decoding.
+        ignore_case folds ASCII letters in the text (the needle is fully lowercased)."""
+        heap = self.text_heap.tobytes()
+        pattern = (needle.lower() if ignore_case else needle).encode("utf-8")
+        if ignore_case:
+            heap = heap.lower()
+        hits = []
+        pos = heap.find(pattern)
+        while pos != -1:
+            hits.append(pos)
+            pos = heap.find(pattern, pos + 1)
+        if not hits:
+            return np.empty(0, dtype=np.int64)
+        starts = np.asarray(hits, dtype=np.int64)
+        rows = np.searchsorted(self.text_offsets, starts, side="right") - 1
+        # A match straddling two rows' texts isn't a match.
+        ends = starts + len(pattern)
+        return np.unique(rows[ends <= self.text_offsets[rows + 1]])
+
+    # --- aggregates ---
+
+    def scenario_codes(self) -> tuple[np.ndarray, np.ndarray]:
+        """(scenario names, per-call index into them)."""
+        return np.unique(self.calls["scenario_id"], return_inverse=True)
+
+    def turns_per_call(self, role: Optional[str] = None) -> np.ndarray:
+        """Turn count per call (aligned with calls["call_sid"]), optionally for one role."""
+        call = self.call if role is None else self.call[self.role == role_code(role)]
+        return np.bincount(call, minlength=self.n_calls)
+
+    def words_per_role(self) -> dict:
+        totals = np.bincount(self.role, weights=self.words, minlength=len(ROLES))
+        return {name: int(totals[i]) for i, name in enumerate(ROLES)}
+
+    def words_per_role_by_scenario(self) -> dict:
+        """{scenario: {role: mean words per turn}}."""
+        names, per_call = self.scenario_codes()
+        scenario = per_call[self.call] if len(self) else np.empty(0, dtype=np.int64)
+        key = scenario * len(ROLES) + self.role
+        size = len(names) * len(ROLES)
+        words = np.bincount(key, weights=self.words, minlength=size).reshape(len(names), len(ROLES))
+        turns = np.bincount(key, minlength=size).reshape(len(names), len(ROLES))
+        means = np.divide(words, turns, out=np.zeros(words.shape, dtype=np.float64), where=turns > 0)
+        return {
+            str(s): {role: round(float(means[i, j]), 1) for j, role in enumerate(ROLES) if turns[i, j]}
+            for i, s in enumerate(names)
+        }
+
+    def turns_per_scenario(self) -> dict:
+        """{scenario: (calls, mean turns per call)}."""
+        names, per_call = self.scenario_codes()
+        calls = np.bincount(per_call, minlength=len(names))
+        turns = np.bincount(per_call, weights=self.turns_per_call(), minlength=len(names))
+        return {str(s): (int(calls[i]), round(float(turns[i] / calls[i]), 1)) for i, s in enumerate(names) if calls[i]}
+
+
+def print_summary(table: TurnTable) -> None:
+    per_call = table.turns_per_call()
+    print(f"{table.n_calls} call(s), {len(table)} turn(s), {len(table.text_heap)} bytes of text")
+    if table.n_calls:
+        print(
+            f"Turns per call: mean {per_call.mean():.1f}, median {np.median(per_call):.0f}, "
+            f"min {per_call.min()}, max {per_call.max()}"
+        )
+    print("Words per role:", table.words_per_role())
+    words = table.words_per_role_by_scenario()
+    for scenario, (calls, mean_turns) in table.turns_per_scenario().items():
+        means = words.get(scenario, {})
+        print(f"  {scenario:<20} calls={calls:<6} turns/call={mean_turns:<6} words/turn={means}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Summarize the columnar turn table")
+    ap.add_argument("path", nargs="?", default=TABLE_PATH)
+    args = ap.parse_args()
+    print_summary(TurnTable.load(args.path))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Twilio Media Streams protocol helpers shared by the gevent (server.py) and asyncio
+(server_async.py) servers: TwiML for <Connect><Stream>, inbound event parsing, and
+outbound media/mark frames.
+"""
+import json
+from typing import NamedTuple, Optional
+
+try:  # optional: faster parsing for the (rare) control events
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Twilio sends media events compactly with "event" first:
+# {"event":"media","sequenceNumber":"3","media":{"track":"inbound","chunk":"1","timestamp":"5","payload":"..."},"streamSid":"MZ..."}
+_MEDIA_TAG = '"event":"media"'
+_PAYLOAD_KEY = '"payload":"'
+_TRACK_KEY = '"track":"'
+_TIMESTAMP_KEY = '"timestamp":"'
+
+
+class MediaFrame(NamedTuple):
+    track: str
+    payload: str  # base64 mulaw
+    timestamp: Optional[int] = None  # ms since the stream started (Twilio's media clock)
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _slice_str(message: str, key: str) -> Optional[str]:
+    """Value of the first "key":"..." in message, or None if absent or escaped."""
+    i = message.find(key)
+    if i < 0:
+        return None
+    i += len(key)
+    j = message.find('"', i)
+    if j < 0:
+        return None
+    value = message[i:j]
+    if "\\" in value:
+        return None
+    return value
+
+
+def parse_message(message) -> tuple[Optional[str], Optional[dict], Optional[MediaFrame]]:
+    """
+    Parse one inbound Stream message into (event, data, frame).
+    Media events (50/s per call) take a fast path that slices track, payload and timestamp out of the
+    string without building a dict; data is then None. Anything else (or a media event in an
+    unexpected layout) is fully parsed. Returns (None, None, None) for unparseable input.
+    """
+    if isinstance(message, str) and message.find(_MEDIA_TAG, 0, 64) >= 0:
+        payload = _slice_str(message, _PAYLOAD_KEY)
+        if payload is not None:
+            return (
+                "media",
+                None,
+                MediaFrame(
+                    _slice_str(message, _TRACK_KEY) or "inbound", payload, _to_int(_slice_str(message, _TIMESTAMP_KEY))
+                ),
+            )
+    try:
+        data = _loads(message)
+    except ValueError:
+        return None, None, None
+    if not isinstance(data, dict):
+        return None, None, None
+    event = data.get("event")
+    if event == "media":
+        media = data.get("media") or {}
+        return event, data, MediaFrame(media.get("track", "inbound"), media.get("payload") or "", _to_int(media.get("timestamp")))
+    return event, data, None
+
+
+def stream_url_for(base: str) -> str:
+    """Turn the public HTTP(S) base URL into the wss:// URL of our /media endpoint."""
+    if not base.startswith("http"):
+        base = f"https://{base}"
+    wss_url = base.replace("https://", "wss://").replace("http://", "ws://")
+    return f"{wss_url}/media"
+
+
+def build_stream_twiml(stream_url: str, scenario_id: str, session_id: str = None) -> str:
+    """TwiML that connects the call to our WebSocket stream (for outbound)."""
+    session_param = f'\n      <Parameter name="session_id" value="{session_id}" />' if session_id else ""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+  <Connect>
+    <Stream url="{stream_url}">
+      <Parameter name="scenario_id" value="{scenario_id}" />{session_param}
+    </Stream>
+  </Connect>
+</Response>"""
+
+
+BUSY_MESSAGE = "Sorry, now's not a good time. I'll call back later. Bye."
+
+
+def build_busy_twiml(mode: str = "say") -> str:
+    """TwiML when the process is at capacity: hang up politely ("say") or reject ("reject")."""
+    if mode == "reject":
+        body = '  <Reject reason="busy" />'
+    else:
+        body = f"  <Say>{BUSY_MESSAGE}</Say>\n  <Hangup />"
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+{body}
+</Response>"""
+
+
+def media_message(stream_sid: str, payload: str) -> str:
+    """Outbound media frame (payload is base64 mulaw)."""
+    return json.dumps(
+        {
+            "event": "media",
+            "streamSid": stream_sid,
+            "media": {"payload": payload},
+        }
+    )
+
+
+def mark_message(stream_sid: str, name: str) -> str:
+    """Mark frame; Twilio echoes it back once the preceding audio has played."""
+    return json.dumps(
+        {
+            "event": "mark",
+            "streamSid": stream_sid,
+            "mark": {"name": name},
+        }
+    )